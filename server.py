@@ -4,29 +4,1422 @@ Simple documentation server for the ATS Teamified repository template.
 Serves documentation and provides information about the template setup.
 """
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate, parsedate_to_datetime
 from http.server import HTTPServer, SimpleHTTPRequestHandler
+import argparse
+import asyncio
+import atexit
+import bisect
+import gzip
+import hashlib
+import html
+import http.client
+import io
 import os
 import json
+import math
+import posixpath
+import queue
+import random
+import re
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
 from pathlib import Path
-from urllib.parse import parse_qs, urlparse
+from urllib.parse import parse_qs, unquote, urlparse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content types worth compressing; everything else (PNGs etc.) is already dense.
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript',
+                      'image/svg+xml')
+MIN_COMPRESS_BYTES = 256
+# What opening a requested path can raise when there is no file to serve there.
+UNSERVABLE_ERRORS = (FileNotFoundError, IsADirectoryError, NotADirectoryError,
+                     PermissionError)
+
+
+def compress_variants(body, content_type):
+    """Pre-compress a body once; returns {encoding: (bytes, etag_suffix)}"""
+    variants = {}
+    if len(body) < MIN_COMPRESS_BYTES or not content_type.startswith(COMPRESSIBLE_TYPES):
+        return variants
+    candidates = [('gzip', lambda: gzip.compress(body, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        candidates.insert(0, ('br', lambda: brotli.compress(body, quality=11)))
+    for encoding, compress in candidates:
+        compressed = compress()
+        if len(compressed) < len(body):
+            variants[encoding] = compressed
+    return variants
+
+
+class CachedFile:
+    """Response body and metadata for one file, tagged with its stat signature.
+
+    Files above the streaming threshold keep only their metadata (body is None)
+    and are sent straight from disk with sendfile. In-memory bodies carry their
+    pre-compressed variants so content negotiation never compresses per request.
+    """
+    __slots__ = ('path', 'body', 'content_type', 'mtime_ns', 'size', 'etag',
+                 'last_modified', 'variants', 'header_blocks')
+
+    def __init__(self, path, body, content_type, mtime_ns, size, etag, compress=True):
+        self.path = path
+        self.body = body
+        self.content_type = content_type
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.etag = etag
+        self.last_modified = formatdate(mtime_ns / 1e9, usegmt=True)
+        self.variants = (compress_variants(body, content_type)
+                         if body is not None and compress else {})
+        self.header_blocks = {}
+
+    @classmethod
+    def from_bytes(cls, path, body, content_type, mtime_ns, compress=True):
+        """Build an entry for a response generated in memory rather than read from disk.
+
+        compress=False skips the pre-compressed variants for one-off responses.
+        """
+        return cls(path, body, content_type, mtime_ns, len(body),
+                   make_etag(hashlib.sha256(body)), compress)
+
+    def representation(self, encoding):
+        """Return (body, etag) for an encoding; identity when encoding is None"""
+        if encoding is None:
+            return self.body, self.etag
+        # Each representation needs its own strong validator.
+        return self.variants[encoding], f'{self.etag[:-1]}-{encoding}"'
+
+    def header_block(self, encoding, cache_control, not_modified=False):
+        """Encoded entity header lines for one representation, built once per entry"""
+        key = (encoding, cache_control, not_modified)
+        block = self.header_blocks.get(key)
+        if block is None:
+            body, etag = self.representation(encoding)
+            lines = []
+            if not not_modified:
+                lines.append(f'Content-type: {self.content_type}')
+                lines.append(f'Content-Length: {self.size if body is None else len(body)}')
+                if encoding is not None:
+                    lines.append(f'Content-Encoding: {encoding}')
+            if self.variants:
+                lines.append('Vary: Accept-Encoding')
+            lines.append(f'ETag: {etag}')
+            lines.append(f'Last-Modified: {self.last_modified}')
+            lines.append(f'Cache-Control: {cache_control}')
+            lines.append('Accept-Ranges: bytes')
+            block = ''.join(f'{line}\r\n' for line in lines).encode('latin-1', 'strict')
+            self.header_blocks[key] = block
+        return block
+
+    @property
+    def weight(self):
+        if self.body is None:
+            return 0
+        return len(self.body) + sum(len(body) for body in self.variants.values())
+
+
+def make_etag(digest):
+    """Strong entity tag from a content hash"""
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+class ContentCache:
+    """Byte-bounded LRU cache of file responses, revalidated against mtime and size"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, stream_threshold=256 * 1024):
+        self.max_bytes = max_bytes
+        self.stream_threshold = stream_threshold
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, path, content_type='text/plain', record=True):
+        """Return the response for path, reloading it if the file changed on disk.
+
+        record=False leaves the hit and miss counters alone, for warm-up loads.
+        """
+        stat = os.stat(path)
+        with self.lock:
+            entry = self.entries.get(path)
+            if (entry is not None and entry.mtime_ns == stat.st_mtime_ns
+                    and entry.size == stat.st_size):
+                self.entries.move_to_end(path)
+                self.hits += int(record)
+                return entry
+            self.misses += int(record)
+
+        entry = self.load(path, stat, content_type)
+        self.store(entry)
+        return entry
+
+    def load(self, path, stat, content_type):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            if stat.st_size > self.stream_threshold:
+                body = None
+                for chunk in iter(lambda: f.read(1 << 16), b''):
+                    digest.update(chunk)
+            else:
+                body = f.read()
+                digest.update(body)
+        return CachedFile(path, body, content_type, stat.st_mtime_ns, stat.st_size,
+                          make_etag(digest))
+
+    def store(self, entry):
+        if entry.weight > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(entry.path, None)
+            if previous is not None:
+                self.total_bytes -= previous.weight
+            self.entries[entry.path] = entry
+            self.total_bytes += entry.weight
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= evicted.weight
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+DOC_GLOBS = ('docs/**/*.md', 'ats-app/*.md', 'template-setup/*.md')
+
+
+def iter_doc_paths(root='.'):
+    """Return the markdown documents covered by search, sorted by path"""
+    seen = set()
+    for pattern in DOC_GLOBS:
+        seen.update(Path(root).glob(pattern))
+    return sorted(seen)
+
+
+# Directories never worth serving or watching.
+IGNORED_DIRS = {'node_modules', '__pycache__', 'dist', 'build', 'coverage'}
+
+
+def repository_files(root='.'):
+    """Return every non-hidden file under root, skipping build and dependency dirs"""
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(name for name in dirnames
+                             if not name.startswith('.') and name not in IGNORED_DIRS)
+        for name in filenames:
+            if not name.startswith('.'):
+                files.append(os.path.normpath(os.path.join(dirpath, name)))
+    return files
+
+
+def markdown_headings(text):
+    """Return (level, text) for each ATX heading outside fenced code blocks"""
+    headings = []
+    in_fence = False
+    for line in text.splitlines():
+        if line.startswith(('```', '~~~')):
+            in_fence = not in_fence
+            continue
+        if in_fence or not line.startswith('#'):
+            continue
+        marks, _, heading = line.partition(' ')
+        if heading and len(marks) <= 6 and marks == '#' * len(marks):
+            headings.append((len(marks), heading.strip().rstrip('#').strip()))
+    return headings
+
+
+class FileWatcher:
+    """Polls a set of files and tells subscribers which ones changed or vanished"""
+
+    def __init__(self, scan, interval=2.0):
+        self.scan = scan
+        self.interval = interval
+        self.subscribers = []
+        self.signatures = self.snapshot()
+        self.thread = None
+
+    def snapshot(self):
+        signatures = {}
+        for path in self.scan():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            signatures[str(path)] = (stat.st_mtime_ns, stat.st_size)
+        return signatures
+
+    def subscribe(self, callback):
+        """Register callback(changed_paths, removed_paths)"""
+        self.subscribers.append(callback)
+
+    def poll(self):
+        current = self.snapshot()
+        changed = [path for path, signature in current.items()
+                   if self.signatures.get(path) != signature]
+        removed = [path for path in self.signatures if path not in current]
+        self.signatures = current
+        if changed or removed:
+            for callback in self.subscribers:
+                callback(changed, removed)
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.poll()
+            except Exception as e:
+                print(f'File watcher error: {e}')
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='file-watcher', daemon=True)
+        self.thread.start()
+
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class SearchIndex:
+    """Inverted index over the docs tree with BM25 ranking.
+
+    The per-document term counts are persisted so a restart only re-reads files
+    whose mtime or size changed since the index was written.
+    """
+    FORMAT_VERSION = 1
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, index_path='.docs-search-index.json', root='.'):
+        self.index_path = index_path
+        self.root = root
+        self.documents = {}
+        self.postings = {}
+        self.total_length = 0
+        self.texts = {}
+        self.lock = threading.Lock()
+
+    def load_or_build(self):
+        """Warm start from the persisted index, re-indexing only stale documents"""
+        started = time.perf_counter()
+        try:
+            with open(self.index_path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') == self.FORMAT_VERSION:
+                for path, document in data['documents'].items():
+                    self.add_document(path, document)
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+        current = [str(path) for path in iter_doc_paths(self.root)]
+        stale = []
+        for path in current:
+            stat = os.stat(path)
+            document = self.documents.get(path)
+            if (document is None or document['mtime_ns'] != stat.st_mtime_ns
+                    or document['size'] != stat.st_size):
+                stale.append(path)
+        removed = [path for path in self.documents if path not in set(current)]
+        self.update(stale, removed)
+        print(f'Search index ready: {len(self.documents)} documents, '
+              f'{len(stale)} re-indexed in {(time.perf_counter() - started) * 1000:.0f} ms')
+
+    def add_document(self, path, document):
+        self.documents[path] = document
+        self.total_length += document['length']
+        for term, count in document['terms'].items():
+            self.postings.setdefault(term, {})[path] = count
+
+    def remove_document(self, path):
+        document = self.documents.pop(path, None)
+        self.texts.pop(path, None)
+        if document is None:
+            return
+        self.total_length -= document['length']
+        for term in document['terms']:
+            documents = self.postings.get(term)
+            if documents is not None:
+                documents.pop(path, None)
+                if not documents:
+                    del self.postings[term]
+
+    def read_document(self, path):
+        stat = os.stat(path)
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            text = f.read()
+        tokens = tokenize(text)
+        terms = {}
+        for token in tokens:
+            terms[token] = terms.get(token, 0) + 1
+        title = next((heading for level, heading in markdown_headings(text)
+                      if level == 1), path)
+        return text, {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+                      'title': title, 'length': len(tokens), 'terms': terms}
+
+    def update(self, changed, removed):
+        """Re-index changed documents, drop removed ones and persist the result"""
+        loaded = {}
+        for path in changed:
+            try:
+                loaded[path] = self.read_document(path)
+            except FileNotFoundError:
+                removed = list(removed) + [path]
+        with self.lock:
+            for path in list(loaded) + list(removed):
+                self.remove_document(path)
+            for path, (text, document) in loaded.items():
+                self.add_document(path, document)
+                self.texts[path] = text
+        if loaded or removed:
+            self.save()
+
+    def on_files_changed(self, changed, removed):
+        """FileWatcher callback; ignores files outside the searchable tree"""
+        searchable = {str(path) for path in iter_doc_paths(self.root)}
+        self.update([path for path in changed if path in searchable],
+                    [path for path in removed if path in self.documents])
+
+    def save(self):
+        with self.lock:
+            data = json.dumps({'version': self.FORMAT_VERSION,
+                               'documents': self.documents})
+        tmp_path = f'{self.index_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(data)
+        os.replace(tmp_path, self.index_path)
+
+    def search(self, query, limit=10):
+        """Return the best matching documents with a snippet around the first hit"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self.lock:
+            count = len(self.documents)
+            if not terms or not count:
+                return []
+            average_length = self.total_length / count
+            scores = {}
+            for term in terms:
+                documents = self.postings.get(term)
+                if not documents:
+                    continue
+                idf = math.log(1 + (count - len(documents) + 0.5) / (len(documents) + 0.5))
+                for path, frequency in documents.items():
+                    length = self.documents[path]['length']
+                    norm = frequency + self.K1 * (
+                        1 - self.B + self.B * length / average_length)
+                    scores[path] = (scores.get(path, 0.0)
+                                    + idf * frequency * (self.K1 + 1) / norm)
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+            results = [{'path': path, 'url': '/' + path,
+                        'title': self.documents[path]['title'],
+                        'score': round(score, 4)} for path, score in ranked]
+        for result in results:
+            result['snippet'] = self.snippet(result['path'], terms)
+        return results
+
+    def snippet(self, path, terms, width=160):
+        text = self.texts.get(path)
+        if text is None:
+            try:
+                with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                    text = f.read()
+            except FileNotFoundError:
+                return ''
+            self.texts[path] = text
+        lowered = text.lower()
+        positions = [lowered.find(term) for term in terms]
+        positions = [position for position in positions if position >= 0]
+        start = max(min(positions) - width // 4, 0) if positions else 0
+        return ' '.join(text[start:start + width].split())
+
+
+class RepositoryTree:
+    """In-memory listing of repository files with markdown titles and headings.
+
+    Each file's JSON is serialized once when it is scanned, so a page of the
+    tree is assembled by joining pre-encoded fragments.
+    """
+    DESCRIPTION = {
+        "name": "ats-teamified",
+        "type": "template",
+        "description": "Repository template for development environment setup",
+    }
+
+    def __init__(self, root='.'):
+        self.root = root
+        self.nodes = {}
+        self.encoded = {}
+        self.order = []
+        self.version = 0
+        self.full_entry = None
+        self.lock = threading.Lock()
+
+    def build(self):
+        started = time.perf_counter()
+        self.update(repository_files(self.root), [])
+        print(f'Repository tree ready: {len(self.nodes)} files in '
+              f'{(time.perf_counter() - started) * 1000:.0f} ms')
+
+    def read_node(self, path):
+        stat = os.stat(path)
+        node = {
+            "path": os.path.relpath(path, self.root).replace(os.sep, '/'),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns // 1_000_000 / 1000,
+        }
+        if path.endswith('.md'):
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                headings = markdown_headings(f.read())
+            node["title"] = next((text for level, text in headings if level == 1), None)
+            node["headings"] = [{"level": level, "text": text}
+                                for level, text in headings]
+        return node
+
+    def update(self, changed, removed):
+        """Apply file changes; FileWatcher callback"""
+        nodes = {}
+        for path in changed:
+            try:
+                nodes[path] = self.read_node(path)
+            except FileNotFoundError:
+                removed = list(removed) + [path]
+        with self.lock:
+            for path in removed:
+                node = self.nodes.pop(path, None)
+                if node is not None:
+                    self.encoded.pop(node["path"], None)
+            for path, node in nodes.items():
+                self.nodes[path] = node
+                self.encoded[node["path"]] = json.dumps(node).encode()
+            self.order = sorted(self.encoded)
+            self.version += 1
+            self.full_entry = None
+
+    def page(self, prefix='', extension='', text='', offset=0, limit=None):
+        """Return (total, version, last_mtime, fragments) for the matching files"""
+        with self.lock:
+            order, encoded, version = self.order, self.encoded, self.version
+            nodes = {node["path"]: node for node in self.nodes.values()} if text else None
+            last_mtime = max((node["mtime"] for node in self.nodes.values()), default=0)
+        matches = order
+        if prefix:
+            matches = [path for path in matches if path.startswith(prefix)]
+        if extension:
+            suffix = '.' + extension.lstrip('.')
+            matches = [path for path in matches if path.endswith(suffix)]
+        if text:
+            needle = text.lower()
+            matches = [path for path in matches
+                       if needle in path.lower()
+                       or needle in (nodes[path].get("title") or '').lower()]
+        selected = matches[offset:None if limit is None else offset + limit]
+        return len(matches), version, last_mtime, [encoded[path] for path in selected]
+
+    def render(self, offset=0, limit=None, total=0, fragments=()):
+        header = dict(self.DESCRIPTION, total=total, offset=offset, limit=limit)
+        return (json.dumps(header)[:-1].encode() + b', "files": ['
+                + b', '.join(fragments) + b']}')
+
+    def entry(self, prefix='', extension='', text='', offset=0, limit=None, compress=False):
+        """Build a response for one page of the tree.
+
+        Filtered pages are built per request, so they are sent uncompressed;
+        only the cached full tree pays for the gzip and brotli variants.
+        """
+        total, version, last_mtime, fragments = self.page(
+            prefix, extension, text, offset, limit)
+        body = self.render(offset, limit, total, fragments)
+        return version, CachedFile.from_bytes(
+            'structure', body, 'application/json', int(last_mtime * 1e9), compress)
+
+    def full(self):
+        """The unfiltered tree, rebuilt only when a file changes"""
+        entry = self.full_entry
+        if entry is None:
+            version, entry = self.entry(compress=True)
+            with self.lock:
+                if version == self.version:
+                    self.full_entry = entry
+        return entry
+
+
+SAFE_URL_SCHEMES = ('http', 'https')
+URL_SCHEME = re.compile(r'([A-Za-z][A-Za-z0-9+.-]*):')
+
+
+def attribute_url(url):
+    """Quote an HTML-escaped link target for an attribute; None unless relative or http(s)"""
+    url = html.unescape(url)
+    scheme = URL_SCHEME.match(url)
+    if (scheme and scheme.group(1).lower() not in SAFE_URL_SCHEMES
+            or any(ord(char) < 0x20 for char in url)):
+        return None
+    return html.escape(url, quote=True)
+
+
+def render_image(match):
+    src = attribute_url(match.group(2))
+    alt = html.escape(html.unescape(match.group(1)), quote=True)
+    return f'<img src="{src}" alt="{alt}">' if src else alt
+
+
+def render_link(match):
+    href = attribute_url(match.group(2))
+    return f'<a href="{href}">{match.group(1)}</a>' if href else match.group(1)
+
+
+INLINE_PATTERNS = (
+    (re.compile(r'!\[([^\]]*)\]\(([^)\s]+)\)'), render_image),
+    (re.compile(r'\[([^\]]+)\]\(([^)\s]+)\)'), render_link),
+    (re.compile(r'\*\*(.+?)\*\*'), r'<strong>\1</strong>'),
+    (re.compile(r'(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?![\w*])'), r'<em>\1</em>'),
+    (re.compile(r'~~(.+?)~~'), r'<del>\1</del>'),
+)
+LIST_ITEM = re.compile(r'^(\s*)([-*+]|\d+[.)])\s+(.*)$')
+TABLE_RULE = re.compile(r'^\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?$')
+
+
+def render_inline(text):
+    """Render inline markdown (code spans, emphasis, links) to HTML"""
+    parts = re.split(r'(`[^`]+`)', text)
+    rendered = []
+    for part in parts:
+        if len(part) > 1 and part.startswith('`') and part.endswith('`'):
+            rendered.append(f'<code>{html.escape(part[1:-1])}</code>')
+            continue
+        part = html.escape(part, quote=False)
+        for pattern, replacement in INLINE_PATTERNS:
+            part = pattern.sub(replacement, part)
+        rendered.append(part)
+    return ''.join(rendered)
+
+
+def table_cells(line):
+    return [cell.strip() for cell in line.strip().strip('|').split('|')]
+
+
+def render_markdown_basic(text):
+    """Small stdlib renderer for the markdown subset used in the docs tree"""
+    lines = text.splitlines()
+    out = []
+    paragraph = []
+    index = 0
+
+    def flush_paragraph():
+        if paragraph:
+            out.append(f'<p>{render_inline(" ".join(paragraph))}</p>')
+            paragraph.clear()
+
+    while index < len(lines):
+        line = lines[index]
+        stripped = line.strip()
+        if stripped.startswith(('```', '~~~')):
+            flush_paragraph()
+            fence, language = stripped[:3], stripped[3:].strip()
+            code = []
+            index += 1
+            while index < len(lines) and not lines[index].strip().startswith(fence):
+                code.append(lines[index])
+                index += 1
+            attribute = f' class="language-{html.escape(language)}"' if language else ''
+            out.append(f'<pre><code{attribute}>{html.escape(chr(10).join(code))}'
+                       '</code></pre>')
+        elif not stripped:
+            flush_paragraph()
+        elif stripped.startswith('#') and stripped.lstrip('#').startswith(' '):
+            flush_paragraph()
+            level = min(len(stripped) - len(stripped.lstrip('#')), 6)
+            out.append(f'<h{level}>{render_inline(stripped[level:].strip())}</h{level}>')
+        elif stripped in ('---', '***', '___'):
+            flush_paragraph()
+            out.append('<hr>')
+        elif stripped.startswith('>'):
+            flush_paragraph()
+            quote = []
+            while index < len(lines) and lines[index].strip().startswith('>'):
+                quote.append(lines[index].strip()[1:].strip())
+                index += 1
+            out.append(f'<blockquote>{render_markdown_basic(chr(10).join(quote))}'
+                       '</blockquote>')
+            continue
+        elif (stripped.startswith('|') and index + 1 < len(lines)
+              and TABLE_RULE.match(lines[index + 1].strip())):
+            flush_paragraph()
+            header = ''.join(f'<th>{render_inline(cell)}</th>'
+                             for cell in table_cells(stripped))
+            rows = []
+            index += 2
+            while index < len(lines) and lines[index].strip().startswith('|'):
+                rows.append('<tr>' + ''.join(f'<td>{render_inline(cell)}</td>'
+                                             for cell in table_cells(lines[index]))
+                            + '</tr>')
+                index += 1
+            out.append(f'<table><thead><tr>{header}</tr></thead>'
+                       f'<tbody>{"".join(rows)}</tbody></table>')
+            continue
+        elif LIST_ITEM.match(line):
+            flush_paragraph()
+            ordered = LIST_ITEM.match(line).group(2)[0].isdigit()
+            tag = 'ol' if ordered else 'ul'
+            items = []
+            while index < len(lines):
+                match = LIST_ITEM.match(lines[index])
+                if match:
+                    items.append(render_inline(match.group(3)))
+                elif lines[index].startswith((' ', '\t')) and lines[index].strip() and items:
+                    items[-1] += ' ' + render_inline(lines[index].strip())
+                else:
+                    break
+                index += 1
+            out.append(f'<{tag}>' + ''.join(f'<li>{item}</li>' for item in items)
+                       + f'</{tag}>')
+            continue
+        else:
+            paragraph.append(stripped)
+        index += 1
+    flush_paragraph()
+    return '\n'.join(out)
+
+
+RENDERED_PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>{title}</title>
+<style>
+body {{ font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
+       line-height: 1.6; color: #333; max-width: 960px; margin: 0 auto; padding: 20px; }}
+h1, h2 {{ color: #667eea; }} h3 {{ color: #764ba2; }}
+pre {{ background: #1e1e1e; color: #d4d4d4; padding: 16px; border-radius: 8px;
+       overflow-x: auto; }}
+code {{ font-family: 'Courier New', monospace; }}
+table {{ border-collapse: collapse; margin: 16px 0; }}
+th, td {{ border: 1px solid #ddd; padding: 6px 12px; }}
+blockquote {{ border-left: 4px solid #667eea; margin: 0; padding-left: 16px; color: #555; }}
+</style>
+</head>
+<body>
+<article>
+{body}
+</article>
+</body>
+</html>"""
+
+
+def render_markdown_page(text, title):
+    """Render a markdown document to a standalone HTML page.
+
+    Always uses render_markdown_basic, which escapes raw HTML and unsafe URLs;
+    python-markdown would pass both through.
+    """
+    body = render_markdown_basic(text)
+    return RENDERED_PAGE.format(title=html.escape(title), body=body).encode()
+
+
+class RenderCache:
+    """Byte-bounded LRU of rendered HTML keyed by document path and content hash"""
+
+    def __init__(self, content_cache, max_bytes=32 * 1024 * 1024):
+        self.content_cache = content_cache
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, path, record=True):
+        """Return the rendered page for a markdown file, rendering only after edits"""
+        source = self.content_cache.get(path, record=record)
+        key = (path, source.etag)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += int(record)
+                return entry
+            self.misses += int(record)
+
+        if source.body is None:
+            with open(path, 'rb') as f:
+                text = f.read().decode('utf-8', errors='replace')
+        else:
+            text = source.body.decode('utf-8', errors='replace')
+        title = next((heading for level, heading in markdown_headings(text)
+                      if level == 1), os.path.basename(path))
+        entry = CachedFile.from_bytes(path, render_markdown_page(text, title),
+                                      'text/html; charset=utf-8', source.mtime_ns)
+        self.store(key, entry)
+        return entry
+
+    def store(self, key, entry):
+        if entry.weight > self.max_bytes:
+            return
+        with self.lock:
+            # Older renders of the same document are dead weight.
+            for stale in [other for other in self.entries if other[0] == key[0]]:
+                self.total_bytes -= self.entries.pop(stale).weight
+            self.entries[key] = entry
+            self.total_bytes += entry.weight
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= evicted.weight
+                self.evictions += 1
+
+    def prerender(self, paths):
+        """Render documents ahead of the first request; FileWatcher-compatible.
+
+        Warm-up renders are not counted as misses, so the hit ratio reflects
+        requests only.
+        """
+        for path in paths:
+            # Only the /docs/ and /template-setup/ routes offer ?format=html.
+            if str(path).endswith('.md') and str(path).startswith(
+                    ('docs/', 'template-setup/')):
+                try:
+                    self.get(str(path), record=False)
+                except UNSERVABLE_ERRORS:
+                    pass
+
+    def on_files_changed(self, changed, removed):
+        self.prerender(path for path in changed
+                       if path in {str(doc) for doc in iter_doc_paths()})
+
+    def start_prerender(self):
+        thread = threading.Thread(target=self.prerender, args=(iter_doc_paths(),),
+                                  name='prerender', daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class RequestMetrics:
+    """Per-route request counters, response bytes and latency histograms.
+
+    Each observation takes one short lock; the text exposition is built only
+    when /metrics is scraped. In prefork mode every worker would keep its own,
+    so /metrics is refused there rather than report one random worker.
+    """
+
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.bytes = {}
+        self.histograms = {}
+        self.in_flight = 0
+
+    def begin(self):
+        with self.lock:
+            self.in_flight += 1
+
+    def observe(self, route, status, nbytes, seconds):
+        with self.lock:
+            self.in_flight -= 1
+            key = (route, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.bytes[route] = self.bytes.get(route, 0) + nbytes
+            histogram = self.histograms.get(route)
+            if histogram is None:
+                histogram = self.histograms[route] = [[0] * (len(self.BUCKETS) + 1), 0.0]
+            histogram[0][bisect.bisect_left(self.BUCKETS, seconds)] += 1
+            histogram[1] += seconds
+
+    def render(self, caches=()):
+        """Prometheus text exposition; caches is a list of (name, stats dict)"""
+        with self.lock:
+            requests = sorted(self.requests.items())
+            sent = sorted(self.bytes.items())
+            histograms = sorted((route, (list(counts), total))
+                                for route, (counts, total) in self.histograms.items())
+            in_flight = self.in_flight
+        lines = [
+            '# HELP docs_requests_total Requests handled, by route and status.',
+            '# TYPE docs_requests_total counter',
+        ]
+        for (route, status), count in requests:
+            lines.append(f'docs_requests_total{{route="{route}",status="{status}"}} {count}')
+        lines += [
+            '# HELP docs_response_bytes_total Response body bytes sent, by route.',
+            '# TYPE docs_response_bytes_total counter',
+        ]
+        for route, count in sent:
+            lines.append(f'docs_response_bytes_total{{route="{route}"}} {count}')
+        lines += [
+            '# HELP docs_request_duration_seconds Time to handle a request, by route.',
+            '# TYPE docs_request_duration_seconds histogram',
+        ]
+        for route, (counts, total) in histograms:
+            cumulative = 0
+            for bound, count in zip(self.BUCKETS + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'docs_request_duration_seconds_bucket'
+                             f'{{route="{route}",le="{bound}"}} {cumulative}')
+            lines.append(f'docs_request_duration_seconds_sum{{route="{route}"}} {total:.6f}')
+            lines.append(f'docs_request_duration_seconds_count{{route="{route}"}} {cumulative}')
+        lines += [
+            '# HELP docs_requests_in_flight Requests currently being handled.',
+            '# TYPE docs_requests_in_flight gauge',
+            f'docs_requests_in_flight {in_flight}',
+        ]
+        for name, help_text, kind in (
+                ('hits', 'Cache lookups served from memory.', 'counter'),
+                ('misses', 'Cache lookups that loaded from disk or rendered.', 'counter'),
+                ('evictions', 'Entries evicted to stay under the byte limit.', 'counter'),
+                ('bytes', 'Bytes currently held.', 'gauge'),
+                ('hit_ratio', 'Hits divided by lookups since start.', 'gauge')):
+            metric = f'docs_cache_{name}' + ('_total' if kind == 'counter' else '')
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} {kind}')
+            for cache, stats in caches:
+                lines.append(f'{metric}{{cache="{cache}"}} {stats[name]}')
+        return ('\n'.join(lines) + '\n').encode()
+
+
+class AccessLog:
+    """Access log written in batches by a background thread.
+
+    Request threads only put a tuple on a queue; timestamps are formatted and
+    lines written by the writer, which drains up to batch_size records or
+    waits flush_interval seconds and then issues one write. Requests below
+    400 are kept with probability sample_rate; errors are always logged. A
+    file is rotated once it passes max_bytes, and reopened if another process
+    rotated it first.
+    """
+
+    def __init__(self, path='-', json_lines=False, sample_rate=1.0, max_bytes=0,
+                 backups=5, batch_size=256, flush_interval=0.5):
+        self.path = path
+        self.json_lines = json_lines
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        self.pid = None
+        self.thread = None
+        self.stream = None
+
+    def request(self, client, requestline, status, nbytes, seconds=None):
+        if status < 400 and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        self.ensure_writer()
+        self.queue.put((time.time(), client, requestline, status, nbytes, seconds))
+
+    def message(self, client, text):
+        self.ensure_writer()
+        self.queue.put((time.time(), client, None, None, None, text))
+
+    def ensure_writer(self):
+        """Start the writer thread in this process; threads do not survive fork"""
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.queue = queue.SimpleQueue()
+            self.stream = None
+            self.thread = threading.Thread(target=self.run, name='access-log', daemon=True)
+            self.pid = os.getpid()
+            self.thread.start()
+            atexit.register(self.close)
+
+    def format(self, record):
+        created, client, requestline, status, nbytes, extra = record
+        if self.json_lines:
+            stamp = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(created))
+            item = {'time': f'{stamp}.{int(created * 1000) % 1000:03d}Z', 'client': client}
+            if requestline is None:
+                item['message'] = extra
+            else:
+                item.update(request=requestline, status=status, bytes=nbytes)
+                if extra is not None:
+                    item['duration_ms'] = round(extra * 1000, 3)
+            return json.dumps(item) + '\n'
+        stamp = time.strftime('%d/%b/%Y %H:%M:%S', time.localtime(created))
+        if requestline is None:
+            return f'{client} - - [{stamp}] {extra}\n'
+        return f'{client} - - [{stamp}] "{requestline}" {status} {nbytes}\n'
+
+    def run(self):
+        while True:
+            record = self.queue.get()
+            if record is None:
+                return
+            batch = [record]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if record is None:
+                    self.write(batch)
+                    return
+                batch.append(record)
+            self.write(batch)
+
+    def write(self, batch):
+        data = ''.join(self.format(record) for record in batch)
+        try:
+            stream = self.open_stream(len(data))
+            stream.write(data)
+            stream.flush()
+        except OSError as e:
+            sys.stderr.write(f'access log write failed: {e}\n')
+
+    def open_stream(self, incoming):
+        if self.path == '-':
+            return sys.stderr
+        if self.stream is not None:
+            try:
+                current = os.stat(self.path)
+                opened = os.fstat(self.stream.fileno())
+                rotated = (current.st_ino, current.st_dev) != (opened.st_ino, opened.st_dev)
+            except FileNotFoundError:
+                rotated = True
+            if rotated:
+                self.stream.close()
+                self.stream = None
+            elif self.max_bytes and current.st_size + incoming > self.max_bytes:
+                self.stream.close()
+                self.stream = None
+                self.rotate()
+        if self.stream is None:
+            self.stream = open(self.path, 'a', encoding='utf-8')
+        return self.stream
+
+    def rotate(self):
+        for index in range(self.backups - 1, 0, -1):
+            source = f'{self.path}.{index}'
+            if os.path.exists(source):
+                os.replace(source, f'{self.path}.{index + 1}')
+        if self.backups:
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+
+    def close(self):
+        """Flush queued records and stop the writer"""
+        if self.pid != os.getpid() or not self.thread.is_alive():
+            return
+        self.queue.put(None)
+        self.thread.join(timeout=5)
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+
+# Cache-Control header per route; override with --cache-control ROUTE=VALUE.
+CACHE_CONTROL = {
+    'index': 'no-cache',
+    'structure': 'no-cache',
+    'docs': 'no-cache',
+    'static': 'public, max-age=300',
+    'api': 'no-store',
+}
+
+
+# Requests asking for more ranges than this get the whole body instead.
+MAX_RANGES = 16
+
+
+def parse_byte_ranges(header, size):
+    """Parse a Range header into sorted, coalesced (start, end) pairs, end inclusive.
+
+    Returns None when the header should be ignored (malformed, not bytes, or too
+    many ranges) and [] when no range overlaps the body (416).
+    """
+    unit, _, specs = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not specs.strip():
+        return None
+    ranges = []
+    for spec in specs.split(','):
+        first, dash, last = spec.strip().partition('-')
+        # int() would also take signs, spaces and underscores.
+        if not dash or not all(part.isdigit() for part in (first, last) if part):
+            return None
+        try:
+            if first:
+                start = int(first)
+                end = int(last) if last else max(start, size - 1)
+                if end < start:
+                    return None
+            else:
+                suffix = int(last)
+                if suffix == 0:
+                    continue
+                start, end = max(size - suffix, 0), size - 1
+        except ValueError:
+            return None
+        if start < 0:
+            return None
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+    if len(ranges) > MAX_RANGES:
+        return None
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
 
 class DocumentationHandler(SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body can leave in separate writes; without TCP_NODELAY the
+    # second one waits for a delayed ACK on every reused connection.
+    disable_nagle_algorithm = True
+    # Idle keep-alive connections are dropped after this many seconds.
+    timeout = 15
+    max_requests_per_connection = 100
+    content_cache = ContentCache()
+    render_cache = RenderCache(content_cache)
+    search_index = SearchIndex()
+    repository_tree = RepositoryTree()
+    cache_control = CACHE_CONTROL
+    metrics = RequestMetrics()
+    access_log = AccessLog()
+    # Exact paths, then first path segments, mapped to (handler, metrics route).
+    routes = {
+        '/': ('serve_index', 'index'),
+        '/index.html': ('serve_index', 'index'),
+        '/api/structure': ('serve_structure', 'structure'),
+        '/api/cache': ('serve_cache_stats', 'api'),
+        '/api/search': ('serve_search', 'api'),
+        '/metrics': ('serve_metrics', 'api'),
+    }
+    prefix_routes = {
+        'docs': ('serve_document', 'docs'),
+        'template-setup': ('serve_document', 'template-setup'),
+    }
+    static_route = ('serve_static', 'static')
+    # Set in prefork workers, whose metrics cover only their own requests.
+    per_process_metrics = False
+    generated_entries = {}
+    # Generated pages change only when this script does.
+    generated_mtime_ns = os.stat(__file__).st_mtime_ns
+
+    def handle(self):
+        """Serve requests on one connection until close, idle timeout or request cap"""
+        self.requests_served = getattr(self.request, 'requests_served', 0)
+        if isinstance(self.request, BufferedConnection):
+            # The asyncio front end owns the connection loop: one request per call.
+            self.close_connection = True
+            self.handle_one_request()
+        else:
+            super().handle()
+
+    def send_response(self, code, message=None):
+        super().send_response(code, message)
+        self.response_status = code
+        self.requests_served += 1
+        if self.requests_served >= self.max_requests_per_connection:
+            self.send_header('Connection', 'close')
+
+    def send_header(self, keyword, value):
+        if keyword == 'Content-Length':
+            self.response_bytes = int(value)
+        super().send_header(keyword, value)
+
     def do_GET(self):
-        """Handle GET requests"""
+        """Route a GET or HEAD request through the route tables, recording metrics around it"""
+        started = time.perf_counter()
+        self.response_status = 0
+        self.response_bytes = 0
         parsed_path = urlparse(self.path)
         path = parsed_path.path
-        
-        if path == '/' or path == '/index.html':
-            self.serve_index()
-        elif path == '/api/structure':
-            self.serve_structure()
-        elif path.startswith('/docs/') or path.startswith('/template-setup/'):
-            self.serve_file(path[1:])
+        route = self.routes.get(path)
+        if route is None:
+            segment, separator, _ = path[1:].partition('/')
+            route = self.prefix_routes.get(segment) if separator else None
+            if route is None:
+                route = self.static_route
+        handler, label = route
+        query = parse_qs(parsed_path.query) if parsed_path.query else {}
+        self.metrics.begin()
+        try:
+            getattr(self, handler)(path, query)
+        except Exception:
+            # Whatever status went out first, the response was cut short.
+            self.response_status = 500
+            raise
+        finally:
+            if self.response_status == 304 or self.command == 'HEAD':
+                self.response_bytes = 0
+            elapsed = time.perf_counter() - started
+            self.metrics.observe(label, self.response_status, self.response_bytes, elapsed)
+            self.access_log.request(self.client_address[0], self.requestline,
+                                    self.response_status, self.response_bytes, elapsed)
+
+    def do_HEAD(self):
+        """Route a HEAD request like GET; write_body and friends drop the body"""
+        self.do_GET()
+
+    def log_request(self, code='-', size='-'):
+        # GET and HEAD requests are logged by do_GET once their size and duration are known.
+        if self.command not in ('GET', 'HEAD'):
+            self.access_log.request(self.client_address[0], self.requestline,
+                                    int(code), size)
+
+    def log_message(self, format, *args):
+        self.access_log.message(self.client_address[0], format % args)
+
+    def serve_document(self, path, query):
+        """Serve a file under docs/ or template-setup/, rendering markdown on request"""
+        filepath = self.document_path(path)
+        if filepath is None:
+            self.send_error(404, 'File not found')
+        elif filepath.endswith('.md') and query.get('format') == ['html']:
+            self.serve_rendered(filepath)
+        else:
+            self.serve_file(filepath)
+
+    @staticmethod
+    def document_path(path):
+        """Normalise a document URL path, or None if it leaves its top-level directory"""
+        segment = path[1:].partition('/')[0]
+        filepath = posixpath.normpath(unquote(path[1:]))
+        if '\\' in filepath or '\0' in filepath or not filepath.startswith(segment + '/'):
+            return None
+        return filepath
+
+    def serve_static(self, path, query):
+        """Serve any other file from the working directory, or a directory listing"""
+        filepath = self.translate_path(self.path)
+        if os.path.isfile(filepath):
+            self.serve_file(filepath, 'static', self.guess_type(filepath))
+        elif self.command == 'HEAD':
+            super().do_HEAD()
         else:
             super().do_GET()
-    
-    def serve_index(self):
+
+    @classmethod
+    def precompile(cls):
+        """Build the fixed responses and their header blocks before serving"""
+        entries = [(cls.generated_entry('index', cls.render_index, 'text/html'), 'index'),
+                   (cls.repository_tree.full(), 'structure')]
+        for entry, route in entries:
+            for encoding in (None, *entry.variants):
+                for not_modified in (False, True):
+                    entry.header_block(encoding, cls.cache_control[route], not_modified)
+
+    @classmethod
+    def generated_entry(cls, key, render, content_type):
+        """Return the cached response for a generated page, rendering it on first use"""
+        entry = cls.generated_entries.get(key)
+        if entry is None:
+            entry = CachedFile.from_bytes(key, render(), content_type,
+                                          cls.generated_mtime_ns)
+            cls.generated_entries[key] = entry
+        return entry
+
+    def negotiate_encoding(self, entry):
+        """Pick the best pre-compressed variant the client accepts, or None"""
+        if not entry.variants:
+            return None
+        header = self.headers.get('Accept-Encoding', '')
+        accepted = {}
+        for item in header.split(','):
+            coding, _, params = item.strip().partition(';')
+            quality = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            if coding:
+                accepted[coding.lower()] = quality
+        best, best_quality = None, 0.0
+        for encoding in ('br', 'gzip'):
+            if encoding not in entry.variants:
+                continue
+            quality = accepted.get(encoding, accepted.get('*', 0.0))
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def is_not_modified(self, entry, etag):
+        """Evaluate If-None-Match / If-Modified-Since against an entry"""
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return '*' in tags or any(tag.removeprefix('W/') == etag for tag in tags)
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError, IndexError, OverflowError):
+                return False
+            return entry.mtime_ns // 1_000_000_000 <= since
+        return False
+
+    def send_entry_headers(self, entry, route, flush=True):
+        """Send status and headers for an entry.
+
+        Returns (send_body, body): send_body is False for 304s, body is the
+        negotiated in-memory representation or None when the file is streamed.
+        With flush=False the headers stay buffered for send_entry.
+        """
+        encoding = self.negotiate_encoding(entry)
+        body, etag = entry.representation(encoding)
+        send_body = not self.is_not_modified(entry, etag)
+        self.send_response(200 if send_body else 304)
+        self.buffer_headers(entry.header_block(encoding, self.cache_control[route],
+                                               not send_body))
+        if send_body:
+            self.response_bytes = entry.size if body is None else len(body)
+        if flush:
+            self.end_headers()
+        return send_body, body
+
+    def buffer_headers(self, data):
+        """Queue a raw header block; like send_header, a no-op for HTTP/0.9"""
+        if self.request_version != 'HTTP/0.9':
+            self._headers_buffer.append(data)
+
+    def buffer_body(self, data):
+        """Queue body bytes so they leave in the same write as the headers"""
+        if self.command == 'HEAD':
+            return
+        if not hasattr(self, '_headers_buffer'):
+            self._headers_buffer = []
+        self._headers_buffer.append(data)
+
+    def write_body(self, data):
+        """Write body bytes after the headers have been flushed; nothing for HEAD"""
+        if self.command != 'HEAD':
+            self.wfile.write(data)
+
+    def send_entry(self, entry, route, f=None):
+        """Send an entry, or the ranges of it the client asked for.
+
+        In-memory bodies go out with their headers in one write; large files
+        are streamed from the open file f.
+        """
+        ranges = self.requested_ranges(entry)
+        if ranges is not None:
+            self.send_ranges(entry, route, ranges, f)
+        elif f is not None:
+            send_body, _ = self.send_entry_headers(entry, route)
+            if send_body:
+                self.send_file(f, entry.size)
+        else:
+            send_body, body = self.send_entry_headers(entry, route, flush=False)
+            self.buffer_headers(b'\r\n')
+            if send_body:
+                self.buffer_body(body)
+            self.flush_headers()
+
+    def requested_ranges(self, entry):
+        """Byte ranges to send for this request, or None for a normal response"""
+        header = self.headers.get('Range')
+        if header is None or self.is_not_modified(entry, entry.etag):
+            return None
+        if_range = self.headers.get('If-Range')
+        if if_range is not None and if_range.strip() not in (entry.etag, entry.last_modified):
+            return None
+        return parse_byte_ranges(header, entry.size)
+
+    def send_ranges(self, entry, route, ranges, f=None):
+        """Send 206 with one range or multipart/byteranges, or 416 if none fit"""
+        if not ranges:
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{entry.size}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(206)
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            self.send_header('Content-type', entry.content_type)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{entry.size}')
+            self.send_header('Content-Length', str(end - start + 1))
+            parts = [(b'', start, end)]
+            closing = b''
+        else:
+            boundary = os.urandom(12).hex()
+            parts = [(f'\r\n--{boundary}\r\n'
+                      f'Content-Type: {entry.content_type}\r\n'
+                      f'Content-Range: bytes {start}-{end}/{entry.size}\r\n\r\n'.encode(),
+                      start, end)
+                     for start, end in ranges]
+            closing = f'\r\n--{boundary}--\r\n'.encode()
+            length = sum(len(head) + end - start + 1 for head, start, end in parts)
+            self.send_header('Content-type', f'multipart/byteranges; boundary={boundary}')
+            self.send_header('Content-Length', str(length + len(closing)))
+        self.send_header('ETag', entry.etag)
+        self.send_header('Last-Modified', entry.last_modified)
+        self.send_header('Cache-Control', self.cache_control[route])
+        self.send_header('Accept-Ranges', 'bytes')
+        self.buffer_headers(b'\r\n')
+        if f is None:
+            for head, start, end in parts:
+                self.buffer_body(head)
+                self.buffer_body(entry.body[start:end + 1])
+            self.buffer_body(closing)
+            self.flush_headers()
+            return
+        for head, start, end in parts:
+            # Each part header goes out in the same write as what precedes it.
+            self.buffer_body(head)
+            self.flush_headers()
+            self.send_file(f, end - start + 1, start)
+        if closing:
+            self.write_body(closing)
+
+    def serve_index(self, path=None, query=None):
         """Serve the main index page"""
+        entry = self.generated_entry('index', self.render_index, 'text/html')
+        self.send_entry(entry, 'index')
+
+    @staticmethod
+    def render_index():
+        """Render the main index page"""
         html = """<!DOCTYPE html>
 <html lang="en">
 <head>
@@ -304,48 +1697,647 @@ class DocumentationHandler(SimpleHTTPRequestHandler):
     </div>
 </body>
 </html>"""
-        
+        return html.encode()
+    
+    def serve_structure(self, path, query):
+        """Serve the repository structure as JSON.
+
+        Supports ?prefix=, ?ext=, ?q= (path/title substring), ?offset= and ?limit=.
+        """
+        if not query:
+            entry = self.repository_tree.full()
+        else:
+            try:
+                offset = max(int(query.get('offset', ['0'])[0]), 0)
+                limit = query.get('limit', [None])[0]
+                limit = None if limit is None else max(int(limit), 0)
+            except ValueError:
+                self.send_error(400, 'offset and limit must be integers')
+                return
+            _, entry = self.repository_tree.entry(
+                query.get('prefix', [''])[0], query.get('ext', [''])[0],
+                query.get('q', [''])[0], offset, limit)
+        self.send_entry(entry, 'structure')
+    
+    def serve_cache_stats(self, path=None, query=None):
+        """Serve content cache counters as JSON"""
+        body = json.dumps({"content": self.content_cache.stats(),
+                           "rendered": self.render_cache.stats()}).encode()
         self.send_response(200)
-        self.send_header('Content-type', 'text/html')
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', self.cache_control['api'])
         self.end_headers()
-        self.wfile.write(html.encode())
-    
-    def serve_structure(self):
-        """Serve the repository structure as JSON"""
-        structure = {
-            "name": "ats-teamified",
-            "type": "template",
-            "description": "Repository template for development environment setup"
-        }
-        
+        self.write_body(body)
+
+    def serve_metrics(self, path=None, query=None):
+        """Serve request and cache metrics in Prometheus text format"""
+        if self.per_process_metrics:
+            self.send_error(501, 'Metrics unavailable in prefork mode',
+                            'Each prefork worker counts only its own requests; run with '
+                            '--mode threaded or --mode asyncio to scrape /metrics.')
+            return
+        body = self.metrics.render([('content', self.content_cache.stats()),
+                                    ('rendered', self.render_cache.stats())])
+        self.send_response(200)
+        self.send_header('Content-type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', self.cache_control['api'])
+        self.end_headers()
+        self.write_body(body)
+
+    def serve_search(self, path, query):
+        """Serve ranked full-text search results as JSON"""
+        text = query.get('q', [''])[0]
+        try:
+            limit = max(1, min(int(query.get('limit', ['10'])[0]), 100))
+        except ValueError:
+            limit = 10
+        started = time.perf_counter()
+        results = self.search_index.search(text, limit)
+        body = json.dumps({
+            "query": text,
+            "took_ms": round((time.perf_counter() - started) * 1000, 3),
+            "results": results,
+        }).encode()
         self.send_response(200)
         self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', self.cache_control['api'])
         self.end_headers()
-        self.wfile.write(json.dumps(structure).encode())
-    
-    def serve_file(self, filepath):
+        self.write_body(body)
+
+    def serve_rendered(self, filepath):
+        """Serve a markdown file rendered to HTML"""
+        try:
+            entry = self.render_cache.get(filepath)
+        except UNSERVABLE_ERRORS:
+            self.send_error(404, 'File not found')
+            return
+        self.send_entry(entry, 'docs')
+
+    def serve_file(self, filepath, route='docs', content_type='text/plain'):
         """Serve a file from the repository"""
         try:
-            with open(filepath, 'r') as f:
-                content = f.read()
-            
-            self.send_response(200)
-            if filepath.endswith('.md'):
-                self.send_header('Content-type', 'text/plain')
-            else:
-                self.send_header('Content-type', 'text/plain')
-            self.end_headers()
-            self.wfile.write(content.encode())
-        except FileNotFoundError:
+            entry = self.content_cache.get(filepath, content_type)
+        except UNSERVABLE_ERRORS:
             self.send_error(404, 'File not found')
+            return
 
-def run_server(port=5000):
+        if entry.body is not None:
+            self.send_entry(entry, route)
+            return
+        try:
+            f = open(filepath, 'rb')
+        except UNSERVABLE_ERRORS:
+            self.send_error(404, 'File not found')
+            return
+        with f:
+            self.send_entry(entry, route, f)
+
+    def send_file(self, f, count, offset=0):
+        """Stream count bytes of an open binary file to the client without buffering it"""
+        if self.command != 'HEAD':
+            self.connection.sendfile(f, offset, count)
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that hands each connection to a bounded pool of worker threads"""
+    daemon_threads = True
+
+    def __init__(self, server_address, handler_class, max_workers=32):
+        super().__init__(server_address, handler_class)
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='docs-worker')
+        # Stop accepting once every worker is busy so excess clients wait in
+        # the kernel backlog instead of piling up in an unbounded queue.
+        self.slots = threading.BoundedSemaphore(max_workers)
+
+    def process_request(self, request, client_address):
+        self.slots.acquire()
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True)
+
+
+class BufferedConnection:
+    """Socket stand-in that feeds a handler from memory and collects its output.
+
+    Files passed to sendfile are not collected: with a writer they are sent
+    through it in chunks from the handler's thread, waiting on the event
+    loop's flow control, so a response's memory stays flat whatever its size.
+    """
+    CHUNK = 64 * 1024
+
+    def __init__(self, request_bytes, requests_served=0, writer=None, loop=None):
+        self.request_bytes = request_bytes
+        self.requests_served = requests_served
+        self.writer = writer
+        self.loop = loop
+        self.output = bytearray()
+
+    def makefile(self, mode, *args, **kwargs):
+        return io.BytesIO(self.request_bytes)
+
+    def sendall(self, data):
+        self.output += data
+
+    def sendfile(self, file, offset=0, count=None):
+        file.seek(offset)
+        if self.writer is None:
+            self.output += file.read(count)
+            return
+        # Headers collected so far go out with the first chunk.
+        remaining = count
+        while remaining is None or remaining > 0:
+            chunk = file.read(self.CHUNK if remaining is None else min(self.CHUNK, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            self.output += chunk
+            self.flush()
+
+    def flush(self):
+        """Hand the collected output to the event loop and wait until it drains"""
+        data, self.output = bytes(self.output), bytearray()
+        asyncio.run_coroutine_threadsafe(self.write(data), self.loop).result()
+
+    async def write(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+
+    def settimeout(self, timeout):
+        pass
+
+    def setsockopt(self, *args):
+        pass
+
+
+class AsyncDocumentationServer:
+    """asyncio front end: the event loop owns the sockets, handlers run in a pool"""
+
+    def __init__(self, server_address, handler_class, max_workers=32):
+        self.server_address = server_address
+        self.handler_class = handler_class
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='docs-worker')
+
+    def run_handler(self, request_bytes, client_address, requests_served, writer, loop):
+        """Run one request through the handler and return (unsent output, keep_open)"""
+        connection = BufferedConnection(request_bytes, requests_served, writer, loop)
+        handler = self.handler_class(connection, client_address, self)
+        return bytes(connection.output), not handler.close_connection
+
+    async def handle_client(self, reader, writer):
+        client_address = writer.get_extra_info('peername')
+        loop = asyncio.get_running_loop()
+        requests_served = 0
+        try:
+            while True:
+                try:
+                    request_bytes = await asyncio.wait_for(
+                        reader.readuntil(b'\r\n\r\n'), self.handler_class.timeout)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                        asyncio.TimeoutError):
+                    break
+                response, keep_open = await loop.run_in_executor(
+                    self.executor, self.run_handler, request_bytes, client_address,
+                    requests_served, writer, loop)
+                requests_served += 1
+                writer.write(response)
+                await writer.drain()
+                if not keep_open:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve_forever(self):
+        host, port = self.server_address
+        server = await asyncio.start_server(self.handle_client, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def start_background_services():
+    """Start per-process background threads; must run after any fork"""
+    watcher = FileWatcher(repository_files)
+    watcher.subscribe(DocumentationHandler.search_index.on_files_changed)
+    watcher.subscribe(DocumentationHandler.repository_tree.update)
+    watcher.subscribe(DocumentationHandler.render_cache.on_files_changed)
+    watcher.start()
+    DocumentationHandler.render_cache.start_prerender()
+
+
+def serve_prefork(server_address, workers):
+    """Bind once, then fork workers that all accept on the shared listening socket"""
+    # Each worker keeps a thread pool so idle keep-alive clients can't starve it.
+    httpd = PooledHTTPServer(server_address, DocumentationHandler)
+    DocumentationHandler.per_process_metrics = True
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            # Unwind on SIGTERM so queued access log records are flushed.
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+            start_background_services()
+            try:
+                httpd.serve_forever()
+            finally:
+                DocumentationHandler.access_log.close()
+                os._exit(0)
+        children.append(pid)
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+    finally:
+        httpd.server_close()
+
+
+SERVER_MODES = ('single', 'threaded', 'prefork', 'asyncio')
+
+
+def run_server(port=5000, mode='threaded', workers=None, host='0.0.0.0',
+               cache_bytes=64 * 1024 * 1024, stream_threshold=256 * 1024,
+               idle_timeout=15, max_requests=100, render_cache_bytes=32 * 1024 * 1024,
+               access_log=None):
     """Start the documentation server"""
-    server_address = ('0.0.0.0', port)
-    httpd = HTTPServer(server_address, DocumentationHandler)
-    print(f'Starting documentation server on http://0.0.0.0:{port}')
+    server_address = (host, port)
+    if access_log is not None:
+        DocumentationHandler.access_log = access_log
+    DocumentationHandler.content_cache = ContentCache(cache_bytes, stream_threshold)
+    DocumentationHandler.render_cache = RenderCache(DocumentationHandler.content_cache,
+                                                    render_cache_bytes)
+    DocumentationHandler.timeout = idle_timeout
+    # A single-threaded server must not let one idle connection block the rest.
+    DocumentationHandler.max_requests_per_connection = (
+        1 if mode == 'single' else max_requests)
+    DocumentationHandler.search_index.load_or_build()
+    DocumentationHandler.repository_tree.build()
+    DocumentationHandler.precompile()
+    if workers is None:
+        workers = (os.cpu_count() or 1) if mode == 'prefork' else 32
+    print(f'Starting documentation server on http://{host}:{port} '
+          f'(mode={mode}, workers={workers})')
     print(f'Repository Template Documentation is ready!')
-    httpd.serve_forever()
+
+    if mode not in SERVER_MODES:
+        raise ValueError(f'Unknown server mode: {mode}')
+    if mode == 'prefork':
+        serve_prefork(server_address, workers)
+        return
+
+    start_background_services()
+    if mode == 'asyncio':
+        server = AsyncDocumentationServer(server_address, DocumentationHandler, workers)
+        try:
+            asyncio.run(server.serve_forever())
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if mode == 'single':
+        httpd = HTTPServer(server_address, DocumentationHandler)
+    else:
+        httpd = PooledHTTPServer(server_address, DocumentationHandler, workers)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+def request_target(parsed):
+    """Path and query of a parsed URL, as sent in the request line"""
+    target = parsed.path or '/'
+    return f'{target}?{parsed.query}' if parsed.query else target
+
+
+def run_load_test(url, clients=(1, 4, 16, 64), requests_per_client=50,
+                  keep_alive_modes=(False,)):
+    """Measure throughput and latency against a running server for each client count"""
+    parsed = urlparse(url)
+    target = request_target(parsed)
+
+    def client_worker(keep_alive, latencies, errors):
+        conn = None
+        for _ in range(requests_per_client):
+            started = time.perf_counter()
+            try:
+                if conn is None:
+                    conn = http.client.HTTPConnection(parsed.hostname,
+                                                      parsed.port or 80, timeout=30)
+                conn.request('GET', target,
+                             headers={} if keep_alive else {'Connection': 'close'})
+                response = conn.getresponse()
+                response.read()
+                if not keep_alive or response.will_close:
+                    conn.close()
+                    conn = None
+                latencies.append(time.perf_counter() - started)
+            except (OSError, http.client.HTTPException):
+                errors.append(1)
+                if conn is not None:
+                    conn.close()
+                    conn = None
+        if conn is not None:
+            conn.close()
+
+    print(f'Load test: GET {url} ({requests_per_client} requests per client)')
+    print(f'{"keepalive":>9} {"clients":>8} {"req/s":>10} {"p50 ms":>9} '
+          f'{"p99 ms":>9} {"errors":>7}')
+    results = []
+    for keep_alive in keep_alive_modes:
+        for count in clients:
+            latencies, errors = [], []
+            threads = [threading.Thread(target=client_worker,
+                                        args=(keep_alive, latencies, errors))
+                       for _ in range(count)]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            latencies.sort()
+            throughput = len(latencies) / elapsed if elapsed else 0.0
+            p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0.0
+            p99 = (latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000
+                   if latencies else 0.0)
+            print(f'{"on" if keep_alive else "off":>9} {count:>8} {throughput:>10.1f} '
+                  f'{p50:>9.2f} {p99:>9.2f} {len(errors):>7}')
+            results.append({'keep_alive': keep_alive, 'clients': count,
+                            'throughput': throughput, 'p50_ms': p50,
+                            'p99_ms': p99, 'errors': len(errors)})
+    return results
+
+
+def run_range_benchmark(url, chunk=64 * 1024, iterations=50):
+    """Compare full downloads of a running server's URL against partial reads"""
+    parsed = urlparse(url)
+    target = request_target(parsed)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+
+    def fetch(headers):
+        conn.request('GET', target, headers=headers)
+        response = conn.getresponse()
+        return response.status, len(response.read())
+
+    status, size = fetch({})
+    print(f'Range benchmark: GET {url} ({size} bytes, {iterations} iterations)')
+    print(f'{"request":>14} {"status":>7} {"ms/req":>9} {"bytes/req":>11}')
+    quarter = max(size // 4, chunk)
+    cases = (
+        ('full', {}),
+        ('first chunk', {'Range': f'bytes=0-{chunk - 1}'}),
+        ('resume tail', {'Range': f'bytes=-{chunk}'}),
+        ('4 chunks', {'Range': 'bytes=' + ','.join(
+            f'{i * quarter}-{i * quarter + chunk - 1}' for i in range(4))}),
+    )
+    results = {}
+    for name, headers in cases:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            status, received = fetch(headers)
+        per_request = (time.perf_counter() - started) / iterations
+        print(f'{name:>14} {status:>7} {per_request * 1000:>9.3f} {received:>11}')
+        results[name] = {'status': status, 'ms_per_request': per_request * 1000,
+                         'bytes': received}
+    conn.close()
+    return results
+
+
+def run_file_benchmark(path, iterations=20):
+    """Compare read-and-encode against sendfile for one file over a local socket pair"""
+    size = os.path.getsize(path)
+
+    def drain(sock):
+        while sock.recv(65536):
+            pass
+
+    def buffered(sock):
+        with open(path, 'r') as f:
+            content = f.read()
+        sock.sendall(content.encode())
+
+    def streamed(sock):
+        with open(path, 'rb') as f:
+            sock.sendfile(f, 0, size)
+
+    print(f'File benchmark: {path} ({size} bytes, {iterations} iterations)')
+    print(f'{"path":>10} {"ms/req":>9} {"MB/s":>9} {"peak KiB":>9}')
+    results = {}
+    for name, send in (('buffered', buffered), ('sendfile', streamed)):
+        elapsed, peak = 0.0, 0
+        for _ in range(iterations):
+            server_sock, client_sock = socket.socketpair()
+            reader = threading.Thread(target=drain, args=(client_sock,))
+            reader.start()
+            tracemalloc.start()
+            started = time.perf_counter()
+            send(server_sock)
+            elapsed += time.perf_counter() - started
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            server_sock.close()
+            reader.join()
+            client_sock.close()
+        per_request = elapsed / iterations
+        throughput = size / per_request / 1e6 if per_request else 0.0
+        print(f'{name:>10} {per_request * 1000:>9.2f} {throughput:>9.1f} '
+              f'{peak / 1024:>9.1f}')
+        results[name] = {'ms_per_request': per_request * 1000,
+                         'peak_bytes': peak}
+    return results
+
+
+def run_log_benchmark(records=20000, threads=(1, 8)):
+    """Compare per-request cost of synchronous log_message writes and AccessLog"""
+    requestline = 'GET /docs/Guide/CANDIDATE_PIPELINE_COMPLETE_GUIDE.md HTTP/1.1'
+
+    def synchronous(stream):
+        lock = threading.Lock()
+
+        def log():
+            # What BaseHTTPRequestHandler.log_message does on every request.
+            now = time.time()
+            year, month, day, hh, mm, ss, x, y, z = time.localtime(now)
+            stamp = '%02d/%3s/%04d %02d:%02d:%02d' % (
+                day, SimpleHTTPRequestHandler.monthname[month], year, hh, mm, ss)
+            with lock:
+                stream.write('%s - - [%s] "%s" %s %s\n' % (
+                    '127.0.0.1', stamp, requestline, '200', '-'))
+                stream.flush()
+        return log
+
+    print(f'Access log benchmark: {records} records per run')
+    print(f'{"path":>12} {"threads":>8} {"us/req":>9} {"p99 us":>9}')
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='access-log-bench-') as directory:
+        for clients in threads:
+            for name in ('synchronous', 'queued'):
+                path = os.path.join(directory, f'{name}-{clients}.log')
+                if name == 'synchronous':
+                    stream = open(path, 'a', buffering=1)
+                    log = synchronous(stream)
+                else:
+                    stream = None
+                    access_log = AccessLog(path)
+                    log = lambda: access_log.request('127.0.0.1', requestline, 200, 9486, 0.001)
+                per_thread = records // clients
+                timings = []
+
+                def worker():
+                    local = []
+                    for _ in range(per_thread):
+                        started = time.perf_counter()
+                        log()
+                        local.append(time.perf_counter() - started)
+                    timings.extend(local)
+
+                workers = [threading.Thread(target=worker) for _ in range(clients)]
+                for thread in workers:
+                    thread.start()
+                for thread in workers:
+                    thread.join()
+                if stream is not None:
+                    stream.close()
+                else:
+                    access_log.close()
+                timings.sort()
+                mean = sum(timings) / len(timings)
+                p99 = timings[int(len(timings) * 0.99) - 1]
+                print(f'{name:>12} {clients:>8} {mean * 1e6:>9.2f} {p99 * 1e6:>9.2f}')
+                results[(name, clients)] = {'us_per_request': mean * 1e6, 'p99_us': p99 * 1e6}
+    return results
+
+
+def run_compression_report(root='.'):
+    """Print raw vs compressed sizes and one-off compression cost for the docs tree"""
+    total_raw = 0
+    totals = {'gzip': 0, 'br': 0}
+    total_ms = 0.0
+    encodings = ['gzip'] + (['br'] if brotli is not None else [])
+    header = ''.join(f'{encoding:>10}' for encoding in encodings)
+    print(f'{"document":<60} {"raw":>9}{header} {"build ms":>9}')
+    for path in iter_doc_paths(root):
+        body = path.read_bytes()
+        started = time.perf_counter()
+        variants = compress_variants(body, 'text/plain')
+        elapsed = (time.perf_counter() - started) * 1000
+        total_ms += elapsed
+        total_raw += len(body)
+        sizes = ''
+        for encoding in encodings:
+            size = len(variants.get(encoding, body))
+            totals[encoding] += size
+            sizes += f'{size:>10}'
+        print(f'{str(path)[:60]:<60} {len(body):>9}{sizes} {elapsed:>9.2f}')
+    sizes = ''.join(f'{totals[encoding]:>10}' for encoding in encodings)
+    print(f'{"TOTAL":<60} {total_raw:>9}{sizes} {total_ms:>9.2f}')
+    for encoding in encodings:
+        if total_raw:
+            print(f'{encoding}: {totals[encoding] / total_raw:.1%} of raw size')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='ATS Teamified documentation server')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--mode', choices=SERVER_MODES, default='threaded',
+                        help='concurrency model used to handle requests')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker threads (threaded/asyncio) or processes (prefork)')
+    parser.add_argument('--cache-mb', type=int, default=64,
+                        help='memory budget for cached file responses, in MiB')
+    parser.add_argument('--render-cache-mb', type=int, default=32,
+                        help='memory budget for rendered markdown pages, in MiB')
+    parser.add_argument('--stream-kb', type=int, default=256,
+                        help='files larger than this are streamed with sendfile')
+    parser.add_argument('--benchmark-file', metavar='PATH',
+                        help='compare buffered and sendfile delivery of PATH')
+    parser.add_argument('--benchmark-range', metavar='URL',
+                        help='compare full and Range requests for URL on a running server')
+    parser.add_argument('--cache-control', action='append', default=[],
+                        metavar='ROUTE=VALUE',
+                        help='Cache-Control for a route '
+                             f'({", ".join(CACHE_CONTROL)}); repeatable')
+    parser.add_argument('--idle-timeout', type=float, default=15,
+                        help='seconds before an idle keep-alive connection is closed')
+    parser.add_argument('--max-requests', type=int, default=100,
+                        help='requests served per connection before it is closed')
+    parser.add_argument('--compression-report', action='store_true',
+                        help='report compressed sizes for the docs tree and exit')
+    parser.add_argument('--load-test', metavar='URL',
+                        help='run a load test against URL instead of serving')
+    parser.add_argument('--clients', default='1,4,16,64',
+                        help='comma-separated concurrent client counts for --load-test')
+    parser.add_argument('--requests', type=int, default=50,
+                        help='requests per client for --load-test')
+    parser.add_argument('--keep-alive', action='store_true',
+                        help='run --load-test with and without connection reuse')
+    parser.add_argument('--access-log', default='-', metavar='PATH',
+                        help='access log file, or - for stderr')
+    parser.add_argument('--access-log-json', action='store_true',
+                        help='write the access log as JSON lines')
+    parser.add_argument('--access-log-sample', type=float, default=1.0,
+                        help='fraction of successful requests to log; errors are always logged')
+    parser.add_argument('--access-log-max-mb', type=int, default=0,
+                        help='rotate the access log file past this size (0 disables)')
+    parser.add_argument('--access-log-backups', type=int, default=5,
+                        help='rotated access log files to keep')
+    parser.add_argument('--log-benchmark', action='store_true',
+                        help='compare synchronous and queued access logging and exit')
+    return parser.parse_args(argv)
+
 
 if __name__ == '__main__':
-    run_server()
+    args = parse_args()
+    if args.compression_report:
+        run_compression_report()
+    elif args.benchmark_file:
+        run_file_benchmark(args.benchmark_file)
+    elif args.benchmark_range:
+        run_range_benchmark(args.benchmark_range)
+    elif args.log_benchmark:
+        run_log_benchmark()
+    elif args.load_test:
+        run_load_test(args.load_test,
+                      [int(count) for count in args.clients.split(',')],
+                      args.requests, (False, True) if args.keep_alive else (False,))
+    else:
+        for override in args.cache_control:
+            route, _, value = override.partition('=')
+            if route not in CACHE_CONTROL:
+                raise SystemExit(f'Unknown route for --cache-control: {route}')
+            CACHE_CONTROL[route] = value
+        run_server(args.port, args.mode, args.workers, args.host,
+                   args.cache_mb * 1024 * 1024, args.stream_kb * 1024,
+                   args.idle_timeout, args.max_requests,
+                   args.render_cache_mb * 1024 * 1024,
+                   AccessLog(args.access_log, args.access_log_json,
+                             args.access_log_sample,
+                             args.access_log_max_mb * 1024 * 1024,
+                             args.access_log_backups))
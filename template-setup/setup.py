@@ -9,13 +9,446 @@ import sys
 import platform
 import subprocess
 import json
+import argparse
+import collections
+import hashlib
+import re
+import shlex
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
+from urllib.parse import urlparse
+from urllib.request import urlopen
 
-class DevEnvironmentSetup:
+# Lock shared by every step that drives the system package manager
+# (apt/dpkg, yum, dnf, snap, brew, choco, winget), which cannot run concurrently.
+PACKAGE_LOCK = "package-manager"
+
+def cache_dir():
+    """Per-user directory for setup state and caches"""
+    if platform.system().lower() == "windows":
+        base = Path(os.environ.get("LOCALAPPDATA", Path.home() / "AppData" / "Local"))
+    else:
+        base = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    return base / "ats-dev-setup"
+
+def version_satisfies(found, wanted):
+    """True if a version string such as 'v18.19.0' matches a spec such as '18.x'"""
+    if not wanted:
+        return True
+    if not found:
+        return False
+    wanted_parts = [part for part in str(wanted).split(".") if part.isdigit()]
+    return re.findall(r"\d+", found)[:len(wanted_parts)] == wanted_parts
+
+def command_text(command):
+    """A command for logs and reports: argv lists are shown shell-quoted"""
+    return command if isinstance(command, str) else shlex.join(command)
+
+def global_git_config_path():
+    """The file `git config --global` writes to"""
+    if os.environ.get("GIT_CONFIG_GLOBAL"):
+        return Path(os.environ["GIT_CONFIG_GLOBAL"])
+    home = Path.home() / ".gitconfig"
+    xdg = Path(os.environ.get("XDG_CONFIG_HOME", Path.home() / ".config")) / "git" / "config"
+    return xdg if xdg.exists() and not home.exists() else home
+
+def update_git_config(path, values):
+    """Set several keys in a git config file with a single locked rewrite.
+
+    Existing entries are replaced in place, duplicates of them dropped and
+    new keys appended under their section, as `git config` would. The file
+    is rewritten through <path>.lock, the lock git itself takes; a symlinked
+    config is followed and its mode kept.
+    """
+    def split(key):
+        section, _, name = key.partition(".")
+        subsection, _, name = name.rpartition(".")
+        return section.lower(), subsection or None, name.lower()
+    
+    def quote(value):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        return '"' + value.replace("\n", "\\n").replace("\t", "\\t") + '"'
+    
+    def continues(line):
+        # A value ending in an unescaped backslash carries on to the next line.
+        return (len(line) - len(line.rstrip("\\"))) % 2 == 1
+    
+    path = Path(path).resolve()
+    try:
+        lines = path.read_text().splitlines()
+    except FileNotFoundError:
+        lines = []
+    pending = {split(key): (key, value) for key, value in values.items()}
+    done = set()
+    section = None
+    section_end = {}
+    continued = skipping = False
+    output = []
+    for line in lines:
+        if continued:
+            continued = continues(line)
+            if not skipping:
+                output.append(line)
+                section_end[section] = len(output)
+            continue
+        header = re.match(r'\s*\[\s*([^\]\s"]+)(?:\s+"((?:[^"\\]|\\.)*)")?\s*\]', line)
+        if header:
+            name, subsection = header.group(1), header.group(2)
+            if subsection is None and "." in name:
+                name, _, subsection = name.partition(".")
+                subsection = subsection.lower()
+            section = (name.lower(), subsection)
+            output.append(line)
+            section_end[section] = len(output)
+            continue
+        entry = re.match(r"\s*([A-Za-z][A-Za-z0-9-]*)\s*(=|$)", line)
+        target = section and entry and (section + (entry.group(1).lower(),))
+        continued = bool(entry) and continues(line)
+        skipping = target in done or target in pending
+        if target in done:
+            continue
+        if target in pending:
+            key, value = pending.pop(target)
+            output.append(f"\t{key.rpartition('.')[2]} = {quote(value)}")
+            done.add(target)
+        else:
+            output.append(line)
+        if section:
+            section_end[section] = len(output)
+    
+    additions = {}
+    for (name, subsection, _), (key, value) in pending.items():
+        additions.setdefault((name, subsection), []).append(
+            f"\t{key.rpartition('.')[2]} = {quote(value)}")
+    # Insert into existing sections from the bottom up so earlier indexes hold.
+    for section in sorted(set(additions) & set(section_end), key=section_end.get, reverse=True):
+        index = section_end[section]
+        output[index:index] = additions.pop(section)
+    for (name, subsection), entries in additions.items():
+        output.append(f'[{name} "{subsection}"]' if subsection else f"[{name}]")
+        output.extend(entries)
+    
+    try:
+        mode = path.stat().st_mode & 0o7777
+    except FileNotFoundError:
+        mode = None
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lock = path.with_name(path.name + ".lock")
+    fd = os.open(lock, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write("\n".join(output) + "\n")
+        if mode is not None:
+            os.chmod(lock, mode)
+        os.replace(lock, path)
+    except BaseException:
+        try:
+            os.remove(lock)
+        except OSError:
+            pass
+        raise
+
+class InstalledState:
+    """Snapshot of installed tools, extensions and Git settings, cached on disk with a TTL"""
+    def __init__(self, path=None, ttl=3600, refresh=False):
+        self.path = Path(path) if path else cache_dir() / "state.json"
+        self.ttl = ttl
+        self.refresh = refresh
+        self.tools = {}
+        self.extensions = set()
+        self.git_config = {}
+    
+    def load(self):
+        """Load a fresh snapshot from disk; returns False if missing or expired"""
+        if self.refresh:
+            return False
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return False
+        if time.time() - data.get("probed_at", 0) > self.ttl:
+            return False
+        self.tools = data.get("tools", {})
+        self.extensions = set(data.get("extensions", []))
+        self.git_config = data.get("git_config", {})
+        return True
+    
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump({
+                "probed_at": time.time(),
+                "tools": self.tools,
+                "extensions": sorted(self.extensions),
+                "git_config": self.git_config
+            }, f, indent=2)
+    
+    def is_installed(self, tool, version=None):
+        found = self.tools.get(tool, {})
+        return found.get("installed", False) and version_satisfies(found.get("version"), version)
+
+class CommandProbe:
+    """Memoized command detection: PATH lookup first, version probes run concurrently"""
+    def __init__(self, timeout=10, max_workers=8):
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.results = {}
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def argv(command):
+        """A bare command name is probed with --version"""
+        if isinstance(command, str):
+            return (command, "--version")
+        return tuple(command)
+    
+    def probe(self, command):
+        """Return {'installed', 'version'} for a command, probing it at most once"""
+        argv = self.argv(command)
+        with self.lock:
+            if argv in self.results:
+                return self.results[argv]
+        result = self.run_probe(argv)
+        with self.lock:
+            return self.results.setdefault(argv, result)
+    
+    def run_probe(self, argv):
+        path = shutil.which(argv[0])
+        if path is None:
+            return {"installed": False, "version": None}
+        if len(argv) == 1:
+            return {"installed": True, "version": None}
+        try:
+            result = subprocess.run([path, *argv[1:]], capture_output=True, text=True,
+                                    timeout=self.timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            return {"installed": False, "version": None}
+        output = (result.stdout or result.stderr).strip().splitlines()
+        return {"installed": result.returncode == 0,
+                "version": output[0] if output else None}
+    
+    def probe_all(self, commands):
+        """Probe several commands at once; returns results in the same order"""
+        commands = list(commands)
+        if len(commands) <= 1:
+            return [self.probe(command) for command in commands]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(commands))) as pool:
+            return list(pool.map(self.probe, commands))
+    
+    def clear(self):
+        with self.lock:
+            self.results.clear()
+
+class ArtifactCache:
+    """Content-addressed download cache with checksums, LRU size eviction and a mirror.
+
+    Objects are stored by SHA-256 under objects/; index.json maps each URL to
+    its digest. A mirror is a directory (or file:// or https:// URL) laid out
+    as <mirror>/<host>/<path> and is tried before the origin, but only for
+    URLs listed in its manifest.json; what it serves must match that digest.
+    """
+    MANIFEST = "manifest.json"
+    
+    def __init__(self, root=None, max_bytes=2 * 1024**3, mirror=None, max_age=7 * 86400):
+        self.root = Path(root) if root else cache_dir() / "artifacts"
+        self.objects = self.root / "objects"
+        self.index_path = self.root / "index.json"
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        if mirror and "://" not in mirror:
+            mirror = Path(mirror).resolve().as_uri()
+        if mirror and urlparse(mirror).scheme not in ("file", "https"):
+            raise ValueError(f"Mirror must be a directory, file:// or https:// URL: {mirror}")
+        self.mirror = mirror.rstrip("/") if mirror else None
+        self.manifest = None
+        self.lock = threading.Lock()
+        try:
+            with open(self.index_path, "r") as f:
+                self.index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.index = {}
+    
+    def mirror_url(self, url):
+        parsed = urlparse(url)
+        return f"{self.mirror}/{parsed.netloc}{parsed.path}"
+    
+    def mirror_manifest(self):
+        """URL -> SHA-256 of the objects the mirror provides, read once"""
+        if self.manifest is None:
+            try:
+                with urlopen(f"{self.mirror}/{self.MANIFEST}", timeout=30) as response:
+                    manifest = json.load(response)
+                self.manifest = manifest if isinstance(manifest, dict) else {}
+            except (OSError, ValueError):
+                self.manifest = {}
+        return self.manifest
+    
+    def lookup(self, url, sha256=None):
+        """Path of a usable cached copy of url, or None"""
+        with self.lock:
+            entry = self.index.get(url)
+            if not entry or (sha256 and entry["sha256"] != sha256):
+                return None
+            # Unpinned URLs such as .../latest are refetched once they age out.
+            if not sha256 and time.time() - entry["fetched_at"] > self.max_age:
+                return None
+            path = self.objects / entry["sha256"]
+            if not path.exists():
+                return None
+            entry["used_at"] = time.time()
+            self.save_index()
+            return path
+    
+    def fetch(self, url, sha256=None):
+        """Return a local path for url, downloading it only on a cache miss"""
+        path = self.lookup(url, sha256)
+        if path:
+            return path
+        sources = [(url, sha256)]
+        if self.mirror:
+            expected = self.mirror_manifest().get(url)
+            if expected and (not sha256 or sha256 == expected):
+                sources.insert(0, (self.mirror_url(url), expected))
+        errors = []
+        for source, digest in sources:
+            try:
+                return self.download(url, source, digest)
+            except (OSError, ValueError) as e:
+                errors.append(f"{source}: {e}")
+        raise OSError(f"Could not fetch {url}: " + "; ".join(errors))
+    
+    def download(self, url, source, sha256=None):
+        self.objects.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=self.objects, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out, urlopen(source, timeout=60) as response:
+                while True:
+                    chunk = response.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            found = digest.hexdigest()
+            if sha256 and found != sha256:
+                raise ValueError(f"checksum mismatch: expected {sha256}, got {found}")
+            path = self.objects / found
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        with self.lock:
+            now = time.time()
+            self.index[url] = {"sha256": found, "size": size,
+                               "fetched_at": now, "used_at": now}
+            self.evict()
+            self.save_index()
+        return path
+    
+    def evict(self):
+        """Drop least recently used objects until the cache fits in max_bytes"""
+        sizes = {}
+        for entry in self.index.values():
+            sizes[entry["sha256"]] = entry["size"]
+        total = sum(sizes.values())
+        for url, entry in sorted(self.index.items(), key=lambda item: item[1]["used_at"]):
+            if total <= self.max_bytes:
+                break
+            del self.index[url]
+            if any(other["sha256"] == entry["sha256"] for other in self.index.values()):
+                continue
+            total -= entry["size"]
+            try:
+                os.remove(self.objects / entry["sha256"])
+            except FileNotFoundError:
+                pass
+    
+    def save_index(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(tmp, self.index_path)
+    
+    def export_mirror(self, dest):
+        """Copy every cached artifact into a <host>/<path> mirror directory.
+
+        manifest.json in dest records each URL's digest; mirror clients only
+        accept objects listed there.
+        """
+        dest = Path(dest)
+        with self.lock:
+            entries = list(self.index.items())
+        try:
+            with open(dest / self.MANIFEST, "r") as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            manifest = {}
+        exported = 0
+        for url, entry in entries:
+            parsed = urlparse(url)
+            target = dest / parsed.netloc / parsed.path.lstrip("/")
+            source = self.objects / entry["sha256"]
+            if source.exists():
+                target.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(source, target)
+                manifest[url] = entry["sha256"]
+                exported += 1
+        dest.mkdir(parents=True, exist_ok=True)
+        with open(dest / self.MANIFEST, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        return exported
+
+class Timeline:
+    """Wall-clock timings of setup steps and the commands they run"""
     def __init__(self):
+        self.started = time.time()
+        self.steps = []
+        self.commands = []
+        self.lock = threading.Lock()
+    
+    def record_step(self, name, started, status):
+        with self.lock:
+            self.steps.append({"step": name, "started": round(started - self.started, 3),
+                               "seconds": round(time.time() - started, 3),
+                               "status": status})
+    
+    def record_command(self, step, command, started, returncode):
+        with self.lock:
+            self.commands.append({"step": step, "command": command_text(command),
+                                  "started": round(started - self.started, 3),
+                                  "seconds": round(time.time() - started, 3),
+                                  "returncode": returncode})
+    
+    def report(self, **extra):
+        with self.lock:
+            return dict(extra, total_seconds=round(time.time() - self.started, 3),
+                        steps=sorted(self.steps, key=lambda item: item["started"]),
+                        commands=sorted(self.commands, key=lambda item: item["started"]))
+
+class DevEnvironmentSetup:
+    def __init__(self, jobs=4, force=False, state_ttl=3600, refresh_state=False,
+                 mirror=None, artifact_cache_mb=2048, step_timeout=1800,
+                 timing_report=None):
         self.platform = platform.system().lower()
         self.script_dir = Path(__file__).parent
         self.config = self.load_config()
+        self.jobs = jobs
+        self.force = force
+        self.state = InstalledState(ttl=state_ttl, refresh=refresh_state or force)
+        self.artifacts = ArtifactCache(max_bytes=artifact_cache_mb * 1024 * 1024,
+                                       mirror=mirror)
+        self.step_timeout = step_timeout
+        self.timing_report = Path(timing_report) if timing_report else cache_dir() / "timings.json"
         
     def load_config(self):
         """Load configuration from config.json"""
@@ -82,12 +515,15 @@ class DevEnvironmentSetup:
     
     def detect_platform(self):
         """Detect the current platform and return appropriate handler"""
+        options = dict(jobs=self.jobs, state=self.state, force=self.force,
+                       artifacts=self.artifacts, step_timeout=self.step_timeout,
+                       journal=StepJournal(), plans=PlanCache())
         if self.platform == "windows":
-            return WindowsSetup(self.config)
+            return WindowsSetup(self.config, **options)
         elif self.platform == "darwin":
-            return MacOSSetup(self.config)
+            return MacOSSetup(self.config, **options)
         elif self.platform == "linux":
-            return LinuxSetup(self.config)
+            return LinuxSetup(self.config, **options)
         else:
             raise OSError(f"Unsupported platform: {self.platform}")
     
@@ -97,6 +533,7 @@ class DevEnvironmentSetup:
         print(f"📱 Detected platform: {self.platform.title()}")
         print("=" * 50)
         
+        setup_handler = None
         try:
             setup_handler = self.detect_platform()
             setup_handler.run()
@@ -104,14 +541,215 @@ class DevEnvironmentSetup:
         except Exception as e:
             print(f"\n❌ Setup failed: {str(e)}")
             sys.exit(1)
+        finally:
+            if setup_handler is not None:
+                self.write_timing_report(setup_handler.timeline)
+    
+    def show_plan(self):
+        """Compile (or load) the plan for this machine and print it without running it"""
+        handler = self.detect_platform()
+        handler.probe_state()
+        plan = handler.load_plan()
+        print_plan(plan, handler.plans.path(plan["key"]))
+    
+    def write_timing_report(self, timeline):
+        """Save the step and command timings as JSON and print the slowest steps"""
+        report = timeline.report(platform=self.platform, jobs=self.jobs)
+        self.timing_report.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.timing_report, "w") as f:
+            json.dump(report, f, indent=2)
+        slowest = sorted(report["steps"], key=lambda item: item["seconds"], reverse=True)
+        print(f"\n⏱️  Total {report['total_seconds']:.1f}s; timings in {self.timing_report}")
+        for step in slowest[:5]:
+            print(f"   {step['seconds']:8.1f}s  {step['step']} ({step['status']})")
+
+class Step:
+    """A unit of setup work, the steps it depends on and the locks it holds"""
+    def __init__(self, name, action, requires=(), locks=()):
+        self.name = name
+        self.action = action
+        self.requires = tuple(requires)
+        self.locks = frozenset(locks)
+
+class StepScheduler:
+    """Run steps concurrently as soon as their dependencies have completed.
+
+    Steps sharing a lock never overlap. After the first failure no new steps
+    are started; running ones finish and the original exception is re-raised.
+    """
+    def __init__(self, steps, max_workers=4, log=print):
+        self.steps = list(steps)
+        self.max_workers = max(1, max_workers)
+        self.log = log
+        names = {step.name for step in self.steps}
+        for step in self.steps:
+            missing = [name for name in step.requires if name not in names]
+            if missing:
+                raise ValueError(f"Step '{step.name}' requires unknown steps: {missing}")
+    
+    def run(self):
+        pending = list(self.steps)
+        completed = set()
+        held_locks = set()
+        running = {}
+        failures = []
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                if not failures:
+                    for step in list(pending):
+                        if len(running) >= self.max_workers:
+                            break
+                        if (all(name in completed for name in step.requires)
+                                and not step.locks & held_locks):
+                            pending.remove(step)
+                            held_locks |= step.locks
+                            running[pool.submit(step.action)] = step
+                if not running:
+                    if pending and not failures:
+                        raise RuntimeError(
+                            "Dependency cycle between steps: "
+                            + ", ".join(step.name for step in pending))
+                    break
+                
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step = running.pop(future)
+                    held_locks -= step.locks
+                    error = future.exception()
+                    if error is not None:
+                        failures.append((step, error))
+                    else:
+                        completed.add(step.name)
+        
+        if failures:
+            for step, error in failures[1:]:
+                self.log(f"Step '{step.name}' also failed: {error}", "ERROR")
+            raise failures[0][1]
+
+# Steps that set up a single tool; the rest are shared by every tool.
+STEP_TOOLS = {
+    "git-config": "git",
+    "vscode-repo": "vscode",
+    "vscode-extensions": "vscode",
+    "docker-repo": "docker",
+    "nodejs-repo": "nodejs",
+    "playwright": "playwright",
+    "postman": "postman",
+}
+
+class StepJournal:
+    """Completed steps of an unfinished run, each with a hash of its inputs.
+
+    A rerun after a failure skips steps whose inputs hash still matches. The
+    journal is cleared once a run completes, so it never hides later drift.
+    """
+    def __init__(self, path=None):
+        self.path = Path(path) if path else cache_dir() / "journal.json"
+        self.lock = threading.Lock()
+        try:
+            with open(self.path, "r") as f:
+                self.steps = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.steps = {}
+    
+    def is_complete(self, name, inputs):
+        with self.lock:
+            return self.steps.get(name, {}).get("inputs") == inputs
+    
+    def complete(self, name, inputs):
+        with self.lock:
+            self.steps[name] = {"inputs": inputs, "completed_at": time.time()}
+            self.save()
+    
+    def clear(self):
+        with self.lock:
+            self.steps = {}
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+    
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.steps, f, indent=2)
+        os.replace(tmp, self.path)
+
+class PlanCache:
+    """Compiled provisioning plans, one JSON file per hash of their inputs.
+
+    Only the most recently used plans are kept; a plan is never edited, a
+    change to any input simply produces a new key.
+    """
+    def __init__(self, root=None, keep=20):
+        self.root = Path(root) if root else cache_dir() / "plans"
+        self.keep = keep
+    
+    def path(self, key):
+        return self.root / f"{key}.json"
+    
+    def load(self, key):
+        path = self.path(key)
+        try:
+            with open(path, "r") as f:
+                plan = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        os.utime(path)
+        return plan
+    
+    def save(self, plan):
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.path(plan["key"])
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(plan, f, indent=2)
+        os.replace(tmp, path)
+        plans = sorted(self.root.glob("*.json"), key=lambda item: item.stat().st_mtime,
+                       reverse=True)
+        for stale in plans[self.keep:]:
+            try:
+                stale.unlink()
+            except OSError:
+                pass
 
 class BaseSetup:
-    def __init__(self, config):
+    # Command used to detect each tool and read its version.
+    TOOL_COMMANDS = {
+        "git": ["git", "--version"],
+        "vscode": ["code", "--version"],
+        "docker": ["docker", "--version"],
+        "nodejs": ["node", "--version"],
+        "python": ["python3.11", "--version"],
+        "playwright": ["playwright", "--version"],
+        "postman": ["postman"],
+    }
+    
+    def __init__(self, config, jobs=4, state=None, force=False, artifacts=None,
+                 step_timeout=1800, journal=None, plans=None):
         self.config = config
         self.tools = config["tools"]
+        self.jobs = jobs
+        self.state = state if state is not None else InstalledState()
+        self.force = force
+        self.artifacts = artifacts if artifacts is not None else ArtifactCache()
+        self.commands = CommandProbe()
+        self.step_timeout = step_timeout
+        self.journal = journal
+        self.plans = plans
+        # Ops of the step being compiled; set only while compile_plan runs it.
+        self.recording = None
+        self.timeline = Timeline()
+        # Name and deadline of the step running on the current thread.
+        self.current = threading.local()
     
     def log(self, message, level="INFO"):
         """Log messages with consistent formatting"""
+        if self.recording is not None:
+            self.recording.append({"log": message, "level": level})
+            return
         levels = {
             "INFO": "ℹ️",
             "SUCCESS": "✅",
@@ -122,35 +760,487 @@ class BaseSetup:
     
     def check_command(self, command):
         """Check if a command exists in PATH"""
+        return self.commands.probe(command)["installed"]
+    
+    def check_commands(self, commands):
+        """Check several commands with one round of concurrent probes"""
+        self.commands.probe_all(commands)
+        return {command: self.check_command(command) for command in commands}
+    
+    def run_command(self, command, check=True, env=None, cwd=None):
+        """Run a command, or add it to the plan being compiled.
+
+        An argv list runs directly; a string goes through the shell and is
+        only used where a pipe, redirection or substitution is needed. env
+        adds variables to the inherited environment.
+        """
+        if self.recording is not None:
+            op = {"run": command, "check": check}
+            if env:
+                op["env"] = env
+            if cwd:
+                op["cwd"] = str(cwd)
+            self.recording.append(op)
+            return subprocess.CompletedProcess(command, 0, "", "")
+        return self.execute(command, check, env, cwd)
+    
+    def execute(self, command, check=True, env=None, cwd=None):
+        """Run a command, streaming its output line by line, and return the result"""
+        shell = isinstance(command, str)
+        if not shell and os.name == "nt":
+            # CreateProcess does not search PATHEXT, so npm.cmd and code.cmd
+            # need their full path.
+            command = [shutil.which(command[0]) or command[0], *command[1:]]
+        step = getattr(self.current, "step", None)
+        deadline = getattr(self.current, "deadline", None)
+        timeout = None if deadline is None else max(0.0, deadline - time.time())
+        prefix = f"   [{step}] " if step else "   "
+        tail = collections.deque(maxlen=50)
+        output = []
+        started = time.time()
+        process = subprocess.Popen(command, shell=shell, stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT, text=True, errors="replace",
+                                   env=dict(os.environ, **env) if env else None, cwd=cwd)
+        timer = None
+        if timeout is not None:
+            timer = threading.Timer(timeout, self.kill_process, [process])
+            timer.daemon = True
+            timer.start()
         try:
-            subprocess.run([command, "--version"], 
-                         capture_output=True, check=True)
-            return True
-        except (subprocess.CalledProcessError, FileNotFoundError):
+            for line in process.stdout:
+                output.append(line)
+                tail.append(line.rstrip())
+                print(prefix + line.rstrip(), flush=True)
+            returncode = process.wait()
+        finally:
+            if timer is not None:
+                timer.cancel()
+            process.stdout.close()
+        self.timeline.record_command(step, command, started, returncode)
+        if timer is not None and time.time() >= deadline and returncode != 0:
+            self.log(f"Command timed out: {command_text(command)}", "ERROR")
+            raise subprocess.TimeoutExpired(command, round(timeout, 1), "".join(output))
+        result = subprocess.CompletedProcess(command, returncode, "".join(output), "")
+        if check and returncode != 0:
+            self.log(f"Command failed ({returncode}): {command_text(command)}", "ERROR")
+            self.log("Last output:\n" + "\n".join(tail), "ERROR")
+            raise subprocess.CalledProcessError(returncode, command, result.stdout)
+        return result
+    
+    @staticmethod
+    def kill_process(process):
+        """Kill a command together with every process it started.
+
+        Commands stay in our session so sudo can prompt and Ctrl-C reaches
+        them; the tree is found through ps instead. SIGTERM comes first
+        because sudo relays it to the command it runs as root.
+        """
+        if os.name == "nt":
+            try:
+                subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                               capture_output=True)
+            except (OSError, subprocess.SubprocessError):
+                pass
+            return
+        pids = [process.pid] + BaseSetup.descendants(process.pid)
+        for sig, grace in ((signal.SIGTERM, 5.0), (signal.SIGKILL, 0.0)):
+            alive = []
+            for pid in pids:
+                try:
+                    os.kill(pid, sig)
+                    alive.append(pid)
+                except OSError:
+                    pass
+            deadline = time.time() + grace
+            while alive and time.time() < deadline:
+                process.poll()
+                alive = [pid for pid in alive if BaseSetup.pid_alive(pid)]
+                time.sleep(0.1)
+            pids = alive
+    
+    @staticmethod
+    def descendants(pid):
+        """Process ids of every descendant of pid, from ps"""
+        try:
+            listing = subprocess.run(["ps", "-A", "-o", "pid=,ppid="], capture_output=True,
+                                     text=True, timeout=10).stdout
+        except (OSError, subprocess.SubprocessError):
+            return []
+        children = collections.defaultdict(list)
+        for line in listing.splitlines():
+            fields = line.split()
+            if len(fields) == 2 and fields[0].isdigit() and fields[1].isdigit():
+                children[int(fields[1])].append(int(fields[0]))
+        found, pending = [], [pid]
+        while pending:
+            for child in children.get(pending.pop(), ()):
+                found.append(child)
+                pending.append(child)
+        return found
+    
+    @staticmethod
+    def pid_alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
             return False
+        except OSError:
+            return True
+        return True
+    
+    def timed(self, step):
+        """Wrap a step's action to record its duration and enforce the step timeout"""
+        def action():
+            self.current.step = step.name
+            self.current.deadline = time.time() + self.step_timeout if self.step_timeout else None
+            started = time.time()
+            status = "failed"
+            try:
+                step.action()
+                status = "ok"
+            except subprocess.TimeoutExpired:
+                status = "timeout"
+                raise
+            finally:
+                self.timeline.record_step(step.name, started, status)
+                self.current.step = self.current.deadline = None
+        return action
+    
+    def step_inputs(self, step):
+        """Hash of everything a step's outcome depends on"""
+        tool = STEP_TOOLS.get(step.name)
+        inputs = {"step": step.name, "platform": type(self).__name__}
+        if tool:
+            inputs["tool"] = self.tools.get(tool)
+        elif step.name == "packages":
+            inputs["tools"] = {name: self.tools[name] for name in self.tools
+                               if name in self.PACKAGES}
+        data = json.dumps(inputs, sort_keys=True, default=str).encode()
+        return hashlib.sha256(data).hexdigest()
+    
+    def journaled(self, step, inputs):
+        """Wrap a step's action to record it in the journal once it succeeds"""
+        def action():
+            step.action()
+            self.journal.complete(step.name, inputs)
+        return action
     
-    def run_command(self, command, check=True):
-        """Run a command and return the result"""
+    def run_steps(self, steps):
+        """Run setup steps through the dependency-aware scheduler"""
+        if self.journal is not None:
+            inputs = {step.name: self.step_inputs(step) for step in steps}
+            done = {step.name for step in steps
+                    if not self.force and self.journal.is_complete(step.name, inputs[step.name])}
+            if done:
+                self.log(f"Resuming: skipping completed steps {', '.join(sorted(done))}", "INFO")
+            steps = [Step(step.name, self.journaled(step, inputs[step.name]),
+                          [name for name in step.requires if name not in done], step.locks)
+                     for step in steps if step.name not in done]
+        steps = [Step(step.name, self.timed(step), step.requires, step.locks)
+                 for step in steps]
+        StepScheduler(steps, self.jobs, self.log).run()
+    
+    def plan_inputs(self):
+        """Everything that shapes the compiled plan; subclasses add what they detect"""
+        return {
+            "script": hashlib.sha256(Path(__file__).read_bytes()).hexdigest(),
+            "platform": type(self).__name__,
+            "config": self.config,
+            "force": self.force,
+            "tools": self.state.tools,
+            "extensions": sorted(self.state.extensions),
+            "git_config": self.state.git_config,
+        }
+    
+    def compile_plan(self):
+        """Run every planned step against a recorder and return its commands"""
+        compiled = []
+        for step in self.plan_steps():
+            self.recording = []
+            try:
+                step.action()
+            finally:
+                ops, self.recording = self.recording, None
+            compiled.append({"name": step.name, "requires": list(step.requires),
+                             "locks": sorted(step.locks), "ops": ops})
+        return compiled
+    
+    def load_plan(self):
+        """Return the plan for the current inputs, compiling it on a cache miss"""
+        data = json.dumps(self.plan_inputs(), sort_keys=True, default=str).encode()
+        key = hashlib.sha256(data).hexdigest()
+        if self.plans is not None:
+            plan = self.plans.load(key)
+            if plan is not None:
+                self.log(f"Using cached plan {key[:12]} from {self.plans.path(key)}", "INFO")
+                return plan
+        plan = {"key": key, "platform": type(self).__name__, "compiled_at": time.time(),
+                "steps": self.compile_plan()}
+        if self.plans is not None:
+            self.plans.save(plan)
+        return plan
+    
+    def expand(self, command, paths):
+        """Substitute the fetched paths for a compiled command's placeholders"""
+        placeholder = r"@@artifact(\d+)@@"
+        if not isinstance(command, str):
+            return [re.sub(placeholder, lambda match: str(paths[int(match.group(1))]), arg)
+                    for arg in command]
+        def path(match):
+            found = str(paths[int(match.group(1))])
+            return found if os.name == "nt" else shlex.quote(found)
+        return re.sub(placeholder, path, command)
+    
+    def replay(self, ops):
+        """Action that performs a compiled step's ops in order"""
+        def action():
+            paths = {}
+            for op in ops:
+                if "run" in op:
+                    self.run_command(self.expand(op["run"], paths), op.get("check", True),
+                                     op.get("env"), op.get("cwd"))
+                elif "fetch" in op:
+                    paths[op["id"]] = self.fetch_url(op["fetch"], op.get("sha256"))
+                elif "write" in op:
+                    self.store_file(op["write"], op["content"])
+                elif "git-config" in op:
+                    self.store_git_config(op["git-config"])
+                elif "log" in op:
+                    self.log(op["log"], op.get("level", "INFO"))
+        return action
+    
+    def hold_sudo(self, plan):
+        """Ask for the sudo password once before steps start, and keep it fresh.
+
+        Parallel steps would otherwise prompt at the same time. Returns an
+        Event that stops the refresh, or None when no command uses sudo.
+        """
+        commands = (command_text(op["run"]) for step in plan["steps"]
+                    for op in step["ops"] if "run" in op)
+        if (os.name == "nt" or os.geteuid() == 0
+                or not any(re.search(r"(^|[\s|;&])sudo\s", command) for command in commands)):
+            return None
+        self.log("Some steps need sudo; validating credentials once up front", "INFO")
+        subprocess.run(["sudo", "-v"], check=True)
+        stop = threading.Event()
+        def refresh():
+            while not stop.wait(60):
+                subprocess.run(["sudo", "-n", "-v"], capture_output=True)
+        threading.Thread(target=refresh, daemon=True).start()
+        return stop
+    
+    def run_plan(self):
+        """Probe what is already installed, then run only the steps still needed"""
+        self.probe_state()
+        plan = self.load_plan()
+        steps = [Step(step["name"], self.replay(step["ops"]), step["requires"], step["locks"])
+                 for step in plan["steps"]]
+        if steps:
+            keepalive = self.hold_sudo(plan)
+            try:
+                self.run_steps(steps)
+            finally:
+                if keepalive is not None:
+                    keepalive.set()
+            # Record the result so an immediate re-run finishes without work.
+            self.state.refresh = True
+            self.commands.clear()
+            self.probe_state()
+        else:
+            self.log("Everything is already installed and configured", "SUCCESS")
+        if self.journal is not None:
+            self.journal.clear()
+    
+    def fetch_artifact(self, url, sha256=None):
+        """Fetch url through the artifact cache and return the local path.
+
+        While a plan is compiled the download is recorded instead, and a
+        placeholder stands in for the path until the plan runs.
+        """
+        if self.recording is not None:
+            index = sum(1 for op in self.recording if "fetch" in op)
+            self.recording.append({"fetch": url, "sha256": sha256, "id": index})
+            return Path(f"@@artifact{index}@@")
+        return self.fetch_url(url, sha256)
+    
+    def fetch_url(self, url, sha256=None):
+        self.log(f"Fetching {url}", "INFO")
+        return self.artifacts.fetch(url, sha256)
+    
+    def write_file(self, path, content):
+        """Write a file the following commands read, or add it to the plan"""
+        if self.recording is not None:
+            self.recording.append({"write": str(path), "content": content})
+            return
+        self.store_file(path, content)
+    
+    def store_file(self, path, content):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+    
+    def write_git_config(self, values):
+        """Set several global Git keys at once, or add them to the plan"""
+        if self.recording is not None:
+            self.recording.append({"git-config": dict(values)})
+            return
+        self.store_git_config(values)
+    
+    def store_git_config(self, values):
+        update_git_config(global_git_config_path(), values)
+    
+    def playwright_browsers_installed(self):
+        if os.environ.get("PLAYWRIGHT_BROWSERS_PATH"):
+            browsers = Path(os.environ["PLAYWRIGHT_BROWSERS_PATH"])
+        elif platform.system().lower() == "windows":
+            browsers = Path(os.environ.get("LOCALAPPDATA", "")) / "ms-playwright"
+        elif platform.system().lower() == "darwin":
+            browsers = Path.home() / "Library" / "Caches" / "ms-playwright"
+        else:
+            browsers = Path.home() / ".cache" / "ms-playwright"
+        return browsers.is_dir() and any(browsers.iterdir())
+    
+    def probe_state(self):
+        """Detect installed tools, VS Code extensions and global Git settings"""
+        if self.state.load():
+            self.log(f"Using installed-state snapshot from {self.state.path}", "INFO")
+            return
+        names = [tool for tool in self.TOOL_COMMANDS if tool in self.tools]
+        results = self.commands.probe_all(self.TOOL_COMMANDS[tool] for tool in names)
+        tools = {tool: dict(result) for tool, result in zip(names, results)}
+        if tools.get("playwright", {}).get("installed"):
+            tools["playwright"]["installed"] = self.playwright_browsers_installed()
+        # Extensions and settings that cannot be listed count as missing, so
+        # they are applied again; such a snapshot is not saved.
+        complete = True
+        extensions = set()
+        if tools.get("vscode", {}).get("installed"):
+            lines = self.list_output(["code", "--list-extensions"], 60)
+            complete = complete and lines is not None
+            extensions = {line.strip().lower() for line in lines or () if line.strip()}
+        git_config = {}
+        if tools.get("git", {}).get("installed"):
+            lines = self.list_output(["git", "config", "--global", "--list"], 30)
+            complete = complete and lines is not None
+            for line in lines or ():
+                key, _, value = line.partition("=")
+                git_config[key.lower()] = value
+        self.state.tools = tools
+        self.state.extensions = extensions
+        self.state.git_config = git_config
+        if complete:
+            self.state.save()
+    
+    def list_output(self, argv, timeout):
+        """Output lines of a listing command, or None if it could not be run"""
+        # Resolve through PATH first: on Windows code is code.cmd, which
+        # CreateProcess does not find by its bare name.
+        path = shutil.which(argv[0])
+        if path is None:
+            return None
         try:
-            result = subprocess.run(command, shell=True, 
-                                  capture_output=True, text=True, check=check)
-            return result
-        except subprocess.CalledProcessError as e:
-            self.log(f"Command failed: {command}", "ERROR")
-            self.log(f"Error: {e.stderr}", "ERROR")
-            raise
+            result = subprocess.run([path, *argv[1:]], capture_output=True, text=True,
+                                    errors="replace", timeout=timeout)
+        except (OSError, subprocess.SubprocessError) as e:
+            self.log(f"Could not run {argv[0]}: {e}", "WARNING")
+            return None
+        return result.stdout.splitlines()
+    
+    def needs(self, tool):
+        """True if a configured tool is missing or not at the configured version"""
+        if tool not in self.tools:
+            return False
+        if self.force:
+            return True
+        return not self.state.is_installed(tool, self.tools[tool].get("version"))
+    
+    # Packages per tool and package manager; subclasses fill this in.
+    PACKAGES = {}
+    
+    def plan_packages(self, manager):
+        """Collect the packages every tool still needing install gets from one manager"""
+        packages = []
+        for tool in self.tools:
+            if not self.needs(tool):
+                continue
+            for package in self.PACKAGES.get(tool, {}).get(manager, []):
+                if package not in packages:
+                    packages.append(package)
+        return packages
+    
+    def pending_git_config(self):
+        """Git settings that are missing or differ from the team configuration"""
+        wanted = self.tools.get("git", {}).get("config", {})
+        if self.force:
+            return dict(wanted)
+        return {key: value for key, value in wanted.items()
+                if self.state.git_config.get(key.lower()) != str(value)}
+    
+    def pending_extensions(self):
+        """Recommended VS Code extensions that are not installed yet"""
+        wanted = self.tools.get("vscode", {}).get("extensions", [])
+        if self.force:
+            return list(wanted)
+        return [extension for extension in wanted
+                if extension.lower() not in self.state.extensions]
+    
+    def configure_git(self):
+        """Apply the team Git configuration"""
+        # One rewrite of the global config instead of a git process per key.
+        self.write_git_config(self.pending_git_config())
+        self.log("Git configured successfully", "SUCCESS")
+    
+    def install_vscode_extensions(self):
+        """Install the recommended VS Code extensions"""
+        extensions = self.pending_extensions()
+        if not extensions:
+            return
+        # code accepts repeated --install-extension, so one process starts the
+        # extension host and fetches the marketplace metadata for all of them.
+        self.log(f"Installing extensions: {', '.join(extensions)}", "INFO")
+        self.run_command(["code"] + [arg for extension in extensions
+                                     for arg in ("--install-extension", extension)])
+    
+    def install_playwright(self):
+        """Install Playwright"""
+        self.log("Installing Playwright...", "INFO")
+        self.run_command(["npm", "install", "-g", "@playwright/test"])
+        self.run_command(["npx", "playwright", "install"])
+    
+    def post_install_steps(self, requires):
+        """Steps that configure tools once their packages are installed"""
+        steps = []
+        if "git" in self.tools and self.pending_git_config():
+            steps.append(Step("git-config", self.configure_git, requires))
+        if "vscode" in self.tools and self.pending_extensions():
+            steps.append(Step("vscode-extensions", self.install_vscode_extensions,
+                              requires))
+        if self.needs("playwright"):
+            steps.append(Step("playwright", self.install_playwright, requires))
+        return steps
 
 class WindowsSetup(BaseSetup):
-    def __init__(self, config):
-        super().__init__(config)
+    TOOL_COMMANDS = dict(BaseSetup.TOOL_COMMANDS, python=["python", "--version"])
+    PACKAGES = {
+        "git": {"chocolatey": ["git"], "winget": ["Git.Git"]},
+        "vscode": {"chocolatey": ["vscode"], "winget": ["Microsoft.VisualStudioCode"]},
+        "docker": {"chocolatey": ["docker-desktop"], "winget": ["Docker.DockerDesktop"]},
+        "nodejs": {"chocolatey": ["nodejs"], "winget": ["OpenJS.NodeJS"]},
+        "python": {"chocolatey": ["python"], "winget": ["Python.Python.3.11"]},
+        "postman": {"chocolatey": ["postman"], "winget": ["Postman.Postman"]},
+    }
+    
+    def __init__(self, config, **options):
+        super().__init__(config, **options)
         self.package_managers = self.detect_package_managers()
     
     def detect_package_managers(self):
         """Detect available package managers on Windows"""
+        found = self.check_commands(["choco", "winget"])
         managers = {}
-        if self.check_command("choco"):
+        if found["choco"]:
             managers["chocolatey"] = True
-        if self.check_command("winget"):
+        if found["winget"]:
             managers["winget"] = True
         return managers
     
@@ -159,185 +1249,142 @@ class WindowsSetup(BaseSetup):
         if not self.package_managers:
             self.log("Installing Chocolatey package manager...", "INFO")
             # Install Chocolatey
+            script = self.fetch_artifact("https://community.chocolatey.org/install.ps1")
             install_cmd = (
                 "Set-ExecutionPolicy Bypass -Scope Process -Force; "
                 "[System.Net.ServicePointManager]::SecurityProtocol = "
                 "[System.Net.ServicePointManager]::SecurityProtocol -bor 3072; "
-                "iex ((New-Object System.Net.WebClient).DownloadString("
-                "'https://community.chocolatey.org/install.ps1'))"
+                f"iex (Get-Content -Raw '{script}')"
             )
-            self.run_command(f'powershell -Command "{install_cmd}"')
+            self.run_command(["powershell", "-NoProfile", "-Command", install_cmd])
             self.package_managers["chocolatey"] = True
     
-    def install_git(self):
-        """Install and configure Git"""
-        self.log("Installing Git...", "INFO")
-        if "chocolatey" in self.package_managers:
-            self.run_command("choco install git -y")
-        elif "winget" in self.package_managers:
-            self.run_command("winget install --id Git.Git -e --source winget")
-        
-        # Configure Git
-        git_config = self.tools["git"]["config"]
-        for key, value in git_config.items():
-            self.run_command(f'git config --global {key} "{value}"')
-        self.log("Git configured successfully", "SUCCESS")
-    
-    def install_vscode(self):
-        """Install Visual Studio Code and extensions"""
-        self.log("Installing Visual Studio Code...", "INFO")
-        if "chocolatey" in self.package_managers:
-            self.run_command("choco install vscode -y")
-        elif "winget" in self.package_managers:
-            self.run_command("winget install --id Microsoft.VisualStudioCode -e --source winget")
-        
-        # Install extensions
-        extensions = self.tools["vscode"]["extensions"]
-        for extension in extensions:
-            self.log(f"Installing extension: {extension}", "INFO")
-            self.run_command(f"code --install-extension {extension}")
-    
-    def install_docker(self):
-        """Install Docker Desktop"""
-        self.log("Installing Docker Desktop...", "INFO")
+    def install_packages(self):
+        """Install every tool's packages in a single choco or winget transaction"""
         if "chocolatey" in self.package_managers:
-            self.run_command("choco install docker-desktop -y")
+            packages = self.plan_packages("chocolatey")
+            self.log(f"Installing with Chocolatey: {', '.join(packages)}", "INFO")
+            self.run_command(["choco", "install", *packages, "-y"])
         elif "winget" in self.package_managers:
-            self.run_command("winget install --id Docker.DockerDesktop -e --source winget")
-    
-    def install_nodejs(self):
-        """Install Node.js"""
-        self.log("Installing Node.js...", "INFO")
-        if "chocolatey" in self.package_managers:
-            self.run_command("choco install nodejs -y")
-        elif "winget" in self.package_managers:
-            self.run_command("winget install --id OpenJS.NodeJS -e --source winget")
-    
-    def install_python(self):
-        """Install Python"""
-        self.log("Installing Python...", "INFO")
-        if "chocolatey" in self.package_managers:
-            self.run_command("choco install python -y")
-        elif "winget" in self.package_managers:
-            self.run_command("winget install --id Python.Python.3.11 -e --source winget")
-    
-    def install_playwright(self):
-        """Install Playwright"""
-        self.log("Installing Playwright...", "INFO")
-        self.run_command("npm install -g @playwright/test")
-        self.run_command("npx playwright install")
+            packages = self.plan_packages("winget")
+            self.log(f"Installing with winget: {', '.join(packages)}", "INFO")
+            # winget installs several packages in one go only through an import file.
+            manifest = {
+                "$schema": "https://aka.ms/winget-packages.schema.2.0.json",
+                "Sources": [{
+                    "SourceDetails": {
+                        "Name": "winget",
+                        "Argument": "https://cdn.winget.microsoft.com/cache",
+                        "Identifier": "Microsoft.Winget.Source_8wekyb3d8bbwe",
+                        "Type": "Microsoft.PreIndexed.Package"
+                    },
+                    "Packages": [{"PackageIdentifier": package} for package in packages]
+                }]
+            }
+            path = cache_dir() / "winget-import.json"
+            self.write_file(path, json.dumps(manifest))
+            self.run_command(["winget", "import", "--import-file", str(path),
+                              "--accept-package-agreements", "--accept-source-agreements"])
     
-    def install_postman(self):
-        """Install Postman"""
-        self.log("Installing Postman...", "INFO")
-        if "chocolatey" in self.package_managers:
-            self.run_command("choco install postman -y")
-        elif "winget" in self.package_managers:
-            self.run_command("winget install --id Postman.Postman -e --source winget")
+    def plan_inputs(self):
+        return dict(super().plan_inputs(), package_managers=sorted(self.package_managers))
     
     def run(self):
         """Run Windows-specific setup"""
         self.log("Starting Windows setup...", "INFO")
         
-        # Install package manager if needed
-        self.install_package_manager()
-        
-        # Install tools
-        self.install_git()
-        self.install_vscode()
-        self.install_docker()
-        self.install_nodejs()
-        self.install_python()
-        self.install_playwright()
-        self.install_postman()
+        self.run_plan()
         
         self.log("Windows setup completed!", "SUCCESS")
+    
+    def plan_steps(self):
+        """Bootstrap the package manager, install everything at once, then configure"""
+        manager = "winget" if self.package_managers.keys() == {"winget"} else "chocolatey"
+        if not self.plan_packages(manager):
+            return self.post_install_steps([])
+        return [
+            Step("bootstrap", self.install_package_manager, locks=[PACKAGE_LOCK]),
+            Step("packages", self.install_packages, ["bootstrap"], [PACKAGE_LOCK]),
+        ] + self.post_install_steps(["packages"])
 
 class MacOSSetup(BaseSetup):
-    def __init__(self, config):
-        super().__init__(config)
+    PACKAGES = {
+        "git": {"formula": ["git"]},
+        "vscode": {"cask": ["visual-studio-code"]},
+        "docker": {"cask": ["docker"]},
+        "nodejs": {"formula": ["node"]},
+        "python": {"formula": ["python@3.11"]},
+        "postman": {"cask": ["postman"]},
+    }
+    
+    def __init__(self, config, **options):
+        super().__init__(config, **options)
         self.has_homebrew = self.check_command("brew")
     
     def install_homebrew(self):
         """Install Homebrew if not present"""
         if not self.has_homebrew:
             self.log("Installing Homebrew...", "INFO")
-            install_cmd = (
-                '/bin/bash -c "$(curl -fsSL '
-                'https://raw.githubusercontent.com/Homebrew/install/HEAD/install.sh)"'
-            )
-            self.run_command(install_cmd)
+            script = self.fetch_artifact(
+                "https://raw.githubusercontent.com/Homebrew/install/HEAD/install.sh")
+            self.run_command(["/bin/bash", str(script)], env={"NONINTERACTIVE": "1"})
             self.has_homebrew = True
     
-    def install_git(self):
-        """Install and configure Git"""
-        self.log("Installing Git...", "INFO")
-        self.run_command("brew install git")
-        
-        # Configure Git
-        git_config = self.tools["git"]["config"]
-        for key, value in git_config.items():
-            self.run_command(f'git config --global {key} "{value}"')
-        self.log("Git configured successfully", "SUCCESS")
+    def install_packages(self):
+        """Install all formulae in one brew call and all casks in another"""
+        formulae = self.plan_packages("formula")
+        casks = self.plan_packages("cask")
+        if formulae:
+            self.log(f"Installing formulae: {', '.join(formulae)}", "INFO")
+            self.run_command(["brew", "install", *formulae])
+        if casks:
+            self.log(f"Installing casks: {', '.join(casks)}", "INFO")
+            self.run_command(["brew", "install", "--cask", *casks])
     
-    def install_vscode(self):
-        """Install Visual Studio Code and extensions"""
-        self.log("Installing Visual Studio Code...", "INFO")
-        self.run_command("brew install --cask visual-studio-code")
-        
-        # Install extensions
-        extensions = self.tools["vscode"]["extensions"]
-        for extension in extensions:
-            self.log(f"Installing extension: {extension}", "INFO")
-            self.run_command(f"code --install-extension {extension}")
-    
-    def install_docker(self):
-        """Install Docker Desktop"""
-        self.log("Installing Docker Desktop...", "INFO")
-        self.run_command("brew install --cask docker")
-    
-    def install_nodejs(self):
-        """Install Node.js"""
-        self.log("Installing Node.js...", "INFO")
-        self.run_command("brew install node")
-    
-    def install_python(self):
-        """Install Python"""
-        self.log("Installing Python...", "INFO")
-        self.run_command("brew install python@3.11")
-    
-    def install_playwright(self):
-        """Install Playwright"""
-        self.log("Installing Playwright...", "INFO")
-        self.run_command("npm install -g @playwright/test")
-        self.run_command("npx playwright install")
-    
-    def install_postman(self):
-        """Install Postman"""
-        self.log("Installing Postman...", "INFO")
-        self.run_command("brew install --cask postman")
+    def plan_inputs(self):
+        return dict(super().plan_inputs(), has_homebrew=self.has_homebrew)
     
     def run(self):
         """Run macOS-specific setup"""
         self.log("Starting macOS setup...", "INFO")
         
-        # Install Homebrew if needed
-        self.install_homebrew()
-        
-        # Install tools
-        self.install_git()
-        self.install_vscode()
-        self.install_docker()
-        self.install_nodejs()
-        self.install_python()
-        self.install_playwright()
-        self.install_postman()
+        self.run_plan()
         
         self.log("macOS setup completed!", "SUCCESS")
+    
+    def plan_steps(self):
+        """Bootstrap Homebrew, install everything at once, then configure"""
+        if not (self.plan_packages("formula") or self.plan_packages("cask")):
+            return self.post_install_steps([])
+        return [
+            Step("homebrew", self.install_homebrew, locks=[PACKAGE_LOCK]),
+            Step("packages", self.install_packages, ["homebrew"], [PACKAGE_LOCK]),
+        ] + self.post_install_steps(["packages"])
 
 class LinuxSetup(BaseSetup):
-    def __init__(self, config):
-        super().__init__(config)
+    PACKAGES = {
+        "git": {"apt": ["git"], "yum": ["git"], "dnf": ["git"]},
+        "vscode": {"apt": ["code"], "snap": ["code"]},
+        "docker": {
+            "apt": ["docker-ce", "docker-ce-cli", "containerd.io", "docker-compose-plugin"],
+            "yum": ["docker"],
+            "dnf": ["docker"]
+        },
+        "nodejs": {"apt": ["nodejs"], "yum": ["nodejs"], "dnf": ["nodejs"]},
+        "python": {
+            "apt": ["python3.11", "python3.11-pip"],
+            "yum": ["python3.11", "python3.11-pip"],
+            "dnf": ["python3.11", "python3.11-pip"]
+        },
+        "postman": {"snap": ["postman"]},
+    }
+    # Snaps that need confinement disabled; snap applies --classic per call.
+    CLASSIC_SNAPS = {"code"}
+    # Needed to fetch and dearmor the third-party apt repository keys.
+    APT_PREREQUISITES = ["ca-certificates", "curl", "gnupg", "lsb-release", "wget"]
+    
+    def __init__(self, config, **options):
+        super().__init__(config, **options)
         self.distro = self.detect_distro()
         self.package_manager = self.detect_package_manager()
     
@@ -359,104 +1406,86 @@ class LinuxSetup(BaseSetup):
     
     def detect_package_manager(self):
         """Detect available package manager"""
-        if self.check_command("apt"):
-            return "apt"
-        elif self.check_command("yum"):
-            return "yum"
-        elif self.check_command("dnf"):
-            return "dnf"
-        elif self.check_command("snap"):
-            return "snap"
-        else:
-            return "unknown"
+        found = self.check_commands(["apt", "yum", "dnf", "snap"])
+        for manager in ("apt", "yum", "dnf", "snap"):
+            if found[manager]:
+                return manager
+        return "unknown"
+    
+    def has_repo_prerequisites(self):
+        return all(shutil.which(tool) for tool in ("curl", "wget", "gpg", "lsb_release"))
+    
+    def install_repo_prerequisites(self):
+        """Install the tools needed to add apt repositories, if any are missing"""
+        if self.has_repo_prerequisites():
+            return
+        self.run_command(["sudo", "apt", "update"])
+        self.run_command(["sudo", "apt", "install", "-y", *self.APT_PREREQUISITES])
     
-    def install_git(self):
-        """Install and configure Git"""
-        self.log("Installing Git...", "INFO")
+    def add_vscode_repo(self):
+        """Add the Microsoft apt repository for VS Code"""
+        self.log("Adding Visual Studio Code repository...", "INFO")
+        key = self.fetch_artifact("https://packages.microsoft.com/keys/microsoft.asc")
+        self.run_command(["sudo", "gpg", "--dearmor", "--yes", "-o",
+                          "/etc/apt/trusted.gpg.d/packages.microsoft.gpg", str(key)])
+        self.run_command(["sudo", "chmod", "644", "/etc/apt/trusted.gpg.d/packages.microsoft.gpg"])
+        self.run_command(["sudo", "sh", "-c", 'echo "deb [arch=amd64,arm64,armhf signed-by=/etc/apt/trusted.gpg.d/packages.microsoft.gpg] https://packages.microsoft.com/repos/code stable main" > /etc/apt/sources.list.d/vscode.list'])
+    
+    def add_docker_repo(self):
+        """Add the Docker apt repository"""
+        self.log("Adding Docker repository...", "INFO")
+        key = self.fetch_artifact("https://download.docker.com/linux/ubuntu/gpg")
+        self.run_command(["sudo", "mkdir", "-p", "/etc/apt/keyrings"])
+        self.run_command(["sudo", "gpg", "--dearmor", "--yes", "-o",
+                          "/etc/apt/keyrings/docker.gpg", str(key)])
+        self.run_command('echo "deb [arch=$(dpkg --print-architecture) signed-by=/etc/apt/keyrings/docker.gpg] https://download.docker.com/linux/ubuntu $(lsb_release -cs) stable" | sudo tee /etc/apt/sources.list.d/docker.list > /dev/null')
+    
+    def add_nodejs_repo(self):
+        """Add the NodeSource repository for the configured Node.js major version"""
+        self.log("Adding NodeSource repository...", "INFO")
+        major = str(self.tools["nodejs"].get("version", "18.x")).split(".")[0]
         if self.package_manager == "apt":
-            self.run_command("sudo apt update && sudo apt install -y git")
-        elif self.package_manager == "yum":
-            self.run_command("sudo yum install -y git")
-        elif self.package_manager == "dnf":
-            self.run_command("sudo dnf install -y git")
-        
-        # Configure Git
-        git_config = self.tools["git"]["config"]
-        for key, value in git_config.items():
-            self.run_command(f'git config --global {key} "{value}"')
-        self.log("Git configured successfully", "SUCCESS")
+            # Configure the repository directly: the setup_XX.x script runs its
+            # own apt update, which the batched refresh below already covers.
+            key = self.fetch_artifact("https://deb.nodesource.com/gpgkey/nodesource-repo.gpg.key")
+            self.run_command(["sudo", "mkdir", "-p", "/etc/apt/keyrings"])
+            self.run_command(["sudo", "gpg", "--dearmor", "--yes", "-o",
+                              "/etc/apt/keyrings/nodesource.gpg", str(key)])
+            self.run_command(f'echo "deb [signed-by=/etc/apt/keyrings/nodesource.gpg] https://deb.nodesource.com/node_{major}.x nodistro main" | sudo tee /etc/apt/sources.list.d/nodesource.list > /dev/null')
+        else:
+            script = self.fetch_artifact(f"https://rpm.nodesource.com/setup_{major}.x")
+            self.run_command(["sudo", "bash", str(script)])
     
-    def install_vscode(self):
-        """Install Visual Studio Code and extensions"""
-        self.log("Installing Visual Studio Code...", "INFO")
+    def install_packages(self):
+        """Refresh metadata once and install every tool's packages in one transaction"""
+        packages = self.plan_packages(self.package_manager)
+        if not packages:
+            return
+        self.log(f"Installing with {self.package_manager}: {', '.join(packages)}", "INFO")
         if self.package_manager == "apt":
-            self.run_command("wget -qO- https://packages.microsoft.com/keys/microsoft.asc | gpg --dearmor > packages.microsoft.gpg")
-            self.run_command("sudo install -o root -g root -m 644 packages.microsoft.gpg /etc/apt/trusted.gpg.d/")
-            self.run_command("sudo sh -c 'echo \"deb [arch=amd64,arm64,armhf signed-by=/etc/apt/trusted.gpg.d/packages.microsoft.gpg] https://packages.microsoft.com/repos/code stable main\" > /etc/apt/sources.list.d/vscode.list'")
-            self.run_command("sudo apt update && sudo apt install -y code")
+            self.run_command(["sudo", "apt", "update"])
+            self.run_command(["sudo", "apt", "install", "-y", *packages])
+        elif self.package_manager in ("yum", "dnf"):
+            self.run_command(["sudo", self.package_manager, "install", "-y", *packages])
         elif self.package_manager == "snap":
-            self.run_command("sudo snap install --classic code")
-        
-        # Install extensions
-        extensions = self.tools["vscode"]["extensions"]
-        for extension in extensions:
-            self.log(f"Installing extension: {extension}", "INFO")
-            self.run_command(f"code --install-extension {extension}")
-    
-    def install_docker(self):
-        """Install Docker"""
-        self.log("Installing Docker...", "INFO")
-        if self.package_manager == "apt":
-            self.run_command("sudo apt update")
-            self.run_command("sudo apt install -y ca-certificates curl gnupg lsb-release")
-            self.run_command("sudo mkdir -p /etc/apt/keyrings")
-            self.run_command("curl -fsSL https://download.docker.com/linux/ubuntu/gpg | sudo gpg --dearmor -o /etc/apt/keyrings/docker.gpg")
-            self.run_command('echo "deb [arch=$(dpkg --print-architecture) signed-by=/etc/apt/keyrings/docker.gpg] https://download.docker.com/linux/ubuntu $(lsb_release -cs) stable" | sudo tee /etc/apt/sources.list.d/docker.list > /dev/null')
-            self.run_command("sudo apt update && sudo apt install -y docker-ce docker-ce-cli containerd.io docker-compose-plugin")
-        elif self.package_manager == "yum":
-            self.run_command("sudo yum install -y docker")
-        elif self.package_manager == "dnf":
-            self.run_command("sudo dnf install -y docker")
-    
-    def install_nodejs(self):
-        """Install Node.js"""
-        self.log("Installing Node.js...", "INFO")
-        if self.package_manager == "apt":
-            self.run_command("curl -fsSL https://deb.nodesource.com/setup_18.x | sudo -E bash -")
-            self.run_command("sudo apt install -y nodejs")
-        elif self.package_manager == "yum":
-            self.run_command("curl -fsSL https://rpm.nodesource.com/setup_18.x | sudo bash -")
-            self.run_command("sudo yum install -y nodejs")
-        elif self.package_manager == "dnf":
-            self.run_command("curl -fsSL https://rpm.nodesource.com/setup_18.x | sudo bash -")
-            self.run_command("sudo dnf install -y nodejs")
-    
-    def install_python(self):
-        """Install Python"""
-        self.log("Installing Python...", "INFO")
-        if self.package_manager == "apt":
-            self.run_command("sudo apt install -y python3.11 python3.11-pip")
-        elif self.package_manager == "yum":
-            self.run_command("sudo yum install -y python3.11 python3.11-pip")
-        elif self.package_manager == "dnf":
-            self.run_command("sudo dnf install -y python3.11 python3.11-pip")
-    
-    def install_playwright(self):
-        """Install Playwright"""
-        self.log("Installing Playwright...", "INFO")
-        self.run_command("npm install -g @playwright/test")
-        self.run_command("npx playwright install")
+            strict = [package for package in packages if package not in self.CLASSIC_SNAPS]
+            if strict:
+                self.run_command(["sudo", "snap", "install", *strict])
+            for package in packages:
+                if package in self.CLASSIC_SNAPS:
+                    self.run_command(["sudo", "snap", "install", "--classic", package])
     
     def install_postman(self):
-        """Install Postman"""
+        """Install Postman from the upstream tarball"""
         self.log("Installing Postman...", "INFO")
-        if self.package_manager == "snap":
-            self.run_command("sudo snap install postman")
-        else:
-            # Download and install Postman manually
-            self.run_command("wget https://dl.pstmn.io/download/latest/linux64 -O postman.tar.gz")
-            self.run_command("sudo tar -xzf postman.tar.gz -C /opt")
-            self.run_command("sudo ln -s /opt/Postman/Postman /usr/local/bin/postman")
+        tarball = self.fetch_artifact("https://dl.pstmn.io/download/latest/linux64")
+        self.run_command(["sudo", "tar", "-xzf", str(tarball), "-C", "/opt"])
+        self.run_command(["sudo", "ln", "-sf", "/opt/Postman/Postman", "/usr/local/bin/postman"])
+    
+    def plan_inputs(self):
+        return dict(super().plan_inputs(), distro=self.distro,
+                    package_manager=self.package_manager,
+                    repo_prerequisites=self.has_repo_prerequisites())
     
     def run(self):
         """Run Linux-specific setup"""
@@ -464,17 +1493,557 @@ class LinuxSetup(BaseSetup):
         self.log(f"Detected distribution: {self.distro}", "INFO")
         self.log(f"Using package manager: {self.package_manager}", "INFO")
         
-        # Install tools
-        self.install_git()
-        self.install_vscode()
-        self.install_docker()
-        self.install_nodejs()
-        self.install_python()
-        self.install_playwright()
-        self.install_postman()
+        self.run_plan()
         
         self.log("Linux setup completed!", "SUCCESS")
+    
+    def plan_steps(self):
+        """Add repositories, install all packages in one transaction, then configure"""
+        steps = []
+        repos = []
+        if self.package_manager == "apt":
+            # Repository setup only writes files under /etc/apt, so it runs in parallel.
+            for tool, action in (("vscode", self.add_vscode_repo),
+                                 ("docker", self.add_docker_repo),
+                                 ("nodejs", self.add_nodejs_repo)):
+                if self.needs(tool):
+                    repos.append(f"{tool}-repo")
+                    steps.append(Step(f"{tool}-repo", action, ["repo-prerequisites"]))
+            if repos:
+                steps.insert(0, Step("repo-prerequisites", self.install_repo_prerequisites,
+                                     locks=[PACKAGE_LOCK]))
+        elif self.package_manager in ("yum", "dnf") and self.needs("nodejs"):
+            repos.append("nodejs-repo")
+            steps.append(Step("nodejs-repo", self.add_nodejs_repo, locks=[PACKAGE_LOCK]))
+        
+        if self.plan_packages(self.package_manager):
+            steps.append(Step("packages", self.install_packages, repos, [PACKAGE_LOCK]))
+            steps += self.post_install_steps(["packages"])
+        else:
+            steps += self.post_install_steps(repos)
+        # Postman is a plain download unless it comes from snap with the rest.
+        if self.needs("postman") and self.package_manager != "snap":
+            steps.append(Step("postman", self.install_postman))
+        return steps
+
+# Simulated seconds per command, first matching pattern wins; each part of
+# an && chain is costed separately. Downloads are matched as "fetch <url>".
+SIMULATED_LATENCIES = [
+    (r"^fetch .*dl\.pstmn\.io", 20.0),
+    (r"^fetch ", 1.0),
+    (r"apt update", 8.0),
+    (r"apt install -y ca-certificates", 6.0),
+    (r"(apt|yum|dnf) install", 90.0),
+    (r"snap install", 40.0),
+    (r"choco install|winget import", 150.0),
+    (r"brew install --cask", 80.0),
+    (r"brew install", 60.0),
+    (r"install\.ps1|/bin/bash .*install", 45.0),
+    (r"code --install-extension", 12.0),
+    (r"npm install -g", 15.0),
+    (r"npx playwright install", 60.0),
+    (r"tar -xzf", 5.0),
+    (r"gpg --dearmor|bash .*setup_", 1.0),
+]
+
+# Commands the simulated machines already have, per platform.
+SIMULATED_COMMANDS = {
+    "linux": {"apt"},
+    "darwin": set(),
+    "windows": {"winget"},
+}
+
+class SimulationProfile:
+    """Latency model for a simulated provisioning run.
+
+    A JSON profile may override "latencies" (list of [pattern, seconds]),
+    "commands" (platform -> available commands), "installed" (tools already
+    present), "default" (seconds for unmatched commands) and "fail" (patterns
+    of commands that exit non-zero).
+    """
+    def __init__(self, latencies=None, commands=None, installed=(), default=0.5,
+                 time_scale=0.001, fail=()):
+        self.latencies = [(re.compile(pattern), seconds)
+                          for pattern, seconds in (latencies or SIMULATED_LATENCIES)]
+        self.commands = commands or SIMULATED_COMMANDS
+        self.installed = set(installed)
+        self.default = default
+        self.time_scale = time_scale
+        self.fail = [re.compile(pattern) for pattern in fail]
+    
+    @classmethod
+    def load(cls, path, time_scale=0.001):
+        with open(path, "r") as f:
+            data = json.load(f)
+        return cls(data.get("latencies"),
+                   {name: set(found) for name, found in data["commands"].items()}
+                   if "commands" in data else None,
+                   data.get("installed", ()), data.get("default", 0.5), time_scale,
+                   data.get("fail", ()))
+    
+    def fails(self, command):
+        return any(pattern.search(command_text(command)) for pattern in self.fail)
+    
+    def latency(self, command):
+        """Modelled seconds for a command; the parts of an && chain add up"""
+        total = 0.0
+        for part in command_text(command).split("&&"):
+            for pattern, seconds in self.latencies:
+                if pattern.search(part):
+                    total += seconds
+                    break
+            else:
+                total += self.default
+        return total
+
+class SimulatedSetup:
+    """Mixin that replaces every external effect of a platform setup with a fake.
+
+    Commands and downloads sleep for their modelled latency (scaled down by
+    the profile's time_scale) and are recorded on the timeline; nothing is
+    executed, downloaded or written outside the process.
+    """
+    profile = SimulationProfile()
+    platform_name = "linux"
+    
+    def log(self, message, level="INFO"):
+        pass
+    
+    def check_command(self, command):
+        return command in self.profile.commands.get(self.platform_name, set())
+    
+    def check_commands(self, commands):
+        return {command: self.check_command(command) for command in commands}
+    
+    def detect_distro(self):
+        return "debian"
+    
+    def probe_state(self):
+        if self.state.refresh:
+            installed = set(self.tools)
+        else:
+            installed = self.profile.installed
+        self.state.tools = {tool: {"installed": tool in installed,
+                                   "version": self.tools[tool].get("version")}
+                            for tool in self.tools}
+        self.state.extensions = ({extension.lower() for extension in
+                                  self.tools.get("vscode", {}).get("extensions", [])}
+                                 if "vscode" in installed else set())
+        self.state.git_config = ({key.lower(): str(value) for key, value in
+                                  self.tools.get("git", {}).get("config", {}).items()}
+                                 if "git" in installed else {})
+    
+    def simulate(self, command):
+        step = getattr(self.current, "step", None)
+        started = time.time()
+        seconds = self.profile.latency(command)
+        self.modelled.append((step, seconds))
+        time.sleep(seconds * self.profile.time_scale)
+        self.timeline.record_command(step, command, started, 0)
+    
+    def execute(self, command, check=True, env=None, cwd=None):
+        self.simulate(command)
+        returncode = 1 if self.profile.fails(command) else 0
+        if check and returncode:
+            raise subprocess.CalledProcessError(returncode, command_text(command))
+        return subprocess.CompletedProcess(command, returncode, "", "")
+    
+    def fetch_url(self, url, sha256=None):
+        self.simulate(f"fetch {url}")
+        return Path(tempfile.gettempdir()) / "simulated" / Path(urlparse(url).path).name
+    
+    def store_file(self, path, content):
+        pass
+    
+    def store_git_config(self, values):
+        pass
+    
+    def hold_sudo(self, plan):
+        return None
+    
+    def has_repo_prerequisites(self):
+        return all(self.check_command(tool) for tool in ("curl", "wget", "gpg", "lsb_release"))
+    
+    def run_steps(self, steps):
+        self.planned = list(steps)
+        self.pending_tools = [tool for tool in self.tools if self.needs(tool)]
+        super().run_steps(steps)
+
+def simulated_handler(platform_name, profile, config, jobs=4, force=False):
+    """A platform setup whose external effects all go through the fake runner"""
+    classes = {"linux": LinuxSetup, "darwin": MacOSSetup, "windows": WindowsSetup}
+    simulated = type(f"Simulated{classes[platform_name].__name__}",
+                     (SimulatedSetup, classes[platform_name]),
+                     {"profile": profile, "platform_name": platform_name})
+    state = InstalledState(path=Path(tempfile.gettempdir()) / "simulated-state.json")
+    artifacts = ArtifactCache(root=Path(tempfile.gettempdir()) / "simulated-artifacts")
+    handler = simulated(config, jobs=jobs, state=state, force=force, artifacts=artifacts,
+                        step_timeout=0)
+    # (step, modelled seconds) for every simulated command.
+    handler.modelled = []
+    return handler
+
+def profile_run(platform_name, profile, config, jobs=4, force=False):
+    """Replay one platform's setup against the fake runner and summarise it"""
+    handler = simulated_handler(platform_name, profile, config, jobs, force)
+    handler.planned = []
+    handler.pending_tools = []
+    error = None
+    try:
+        handler.run()
+    except Exception as e:
+        error = str(e)
+    
+    # Step costs come from the model; wall time is measured when commands
+    # sleep, and with time_scale 0 is taken to be the critical path.
+    scale = profile.time_scale
+    report = handler.timeline.report(platform=platform_name, jobs=jobs)
+    modelled = collections.Counter()
+    for step, seconds in handler.modelled:
+        modelled[step] += seconds
+    durations = {step["step"]: modelled[step["step"]] for step in report["steps"]}
+    work = sum(durations.values())
+    
+    # Longest dependency chain, using the recorded step durations.
+    finish, previous = {}, {}
+    for step in handler.planned:
+        ready = max(step.requires, key=lambda name: finish[name], default=None)
+        previous[step.name] = ready
+        finish[step.name] = durations.get(step.name, 0.0) + (finish[ready] if ready else 0.0)
+    path = []
+    name = max(finish, key=finish.get, default=None)
+    while name:
+        path.append(name)
+        name = previous[name]
+    wall = report["total_seconds"] / scale if scale else max(finish.values(), default=0.0)
+    
+    # The shared package transaction is split between tools by package count.
+    tool_cost = collections.Counter()
+    if platform_name == "linux":
+        managers = [handler.package_manager]
+    elif platform_name == "darwin":
+        managers = ["formula", "cask"]
+    else:
+        managers = ["winget" if handler.package_managers.keys() == {"winget"} else "chocolatey"]
+    counts = collections.Counter()
+    for tool in handler.pending_tools:
+        for manager in managers:
+            counts[tool] += len(handler.PACKAGES.get(tool, {}).get(manager, []))
+    for name, seconds in durations.items():
+        if name in STEP_TOOLS:
+            tool_cost[STEP_TOOLS[name]] += seconds
+        elif name == "packages" and sum(counts.values()):
+            for tool, count in counts.items():
+                tool_cost[tool] += seconds * count / sum(counts.values())
+        else:
+            tool_cost["(shared)"] += seconds
+    
+    return {
+        "platform": platform_name,
+        "jobs": jobs,
+        "wall_seconds": round(wall, 1),
+        "serial_seconds": round(work, 1),
+        "parallelism": round(work / wall, 2) if wall else 0.0,
+        "critical_path": list(reversed(path)),
+        "critical_path_seconds": round(max(finish.values(), default=0.0), 1),
+        "steps": {name: round(seconds, 1) for name, seconds in durations.items()},
+        "tool_seconds": {tool: round(seconds, 1) for tool, seconds in tool_cost.most_common()
+                         if seconds},
+        "commands": len(report["commands"]),
+        "error": error,
+    }
+
+def print_plan(plan, path=None):
+    """Print a compiled plan as its steps, dependencies and commands"""
+    where = f", cached in {path}" if path else ""
+    print(f"== plan {plan['key'][:12]} ({plan['platform']}, {len(plan['steps'])} steps{where})")
+    for step in plan["steps"]:
+        after = f" after {', '.join(step['requires'])}" if step["requires"] else ""
+        locks = f" [locks {', '.join(step['locks'])}]" if step["locks"] else ""
+        print(f"   {step['name']}{after}{locks}")
+        for op in step["ops"]:
+            if "run" in op:
+                env = "".join(f"{name}={value} " for name, value in op.get("env", {}).items())
+                print(f"      $ {env}{command_text(op['run'])}")
+            elif "fetch" in op:
+                print(f"      fetch {op['fetch']} -> @@artifact{op['id']}@@")
+            elif "write" in op:
+                print(f"      write {op['write']}")
+            elif "git-config" in op:
+                print(f"      git config: {', '.join(op['git-config'])}")
+
+def print_profile(result):
+    print(f"== {result['platform']} (jobs={result['jobs']}, {result['commands']} commands)")
+    print(f"   wall {result['wall_seconds']:.1f}s, serial {result['serial_seconds']:.1f}s, "
+          f"parallelism {result['parallelism']:.2f}x")
+    print(f"   critical path {result['critical_path_seconds']:.1f}s: "
+          + " -> ".join(result["critical_path"]))
+    for tool, seconds in result["tool_seconds"].items():
+        print(f"   {seconds:8.1f}s  {tool}")
+    if result["error"]:
+        print(f"   failed: {result['error']}")
+
+class FleetDriver:
+    """Provision many hosts concurrently, one setup.py process per host.
+
+    The inventory is a JSON list of hosts. Each host has a "name" and an
+    "executor":
+    - "ssh" copies this script to "address" and runs it there. It needs
+      key-based ssh and passwordless sudo on the target.
+    - "local" runs it on this machine.
+    - "simulate" replays "platform" with --simulate. It writes into a
+      per-host directory and is used to exercise the driver without
+      real targets.
+    """
+    REMOTE_DIR = ".ats-dev-setup-fleet"
+    
+    def __init__(self, hosts, workdir=None, max_parallel=8, setup_args=()):
+        self.hosts = hosts
+        self.workdir = Path(workdir) if workdir else cache_dir() / "fleet"
+        self.max_parallel = max(1, max_parallel)
+        self.setup_args = list(setup_args)
+        self.script = Path(__file__).resolve()
+        self.print_lock = threading.Lock()
+    
+    @classmethod
+    def load(cls, inventory, **options):
+        with open(inventory, "r") as f:
+            hosts = json.load(f)
+        names = [host["name"] for host in hosts]
+        if len(set(names)) != len(names):
+            raise ValueError("Inventory host names must be unique")
+        return cls(hosts, **options)
+    
+    def say(self, host, message):
+        with self.print_lock:
+            print(f"[{host['name']}] {message}", flush=True)
+    
+    def commands(self, host, hostdir):
+        """Commands to run for one host, the commands that collect its timing
+        report (run even after a failure) and the report's local path"""
+        python = host.get("python", "python3" if host.get("executor") == "ssh" else sys.executable)
+        extra = self.setup_args + list(host.get("args", []))
+        executor = host.get("executor", "ssh")
+        report = hostdir / "timings.json"
+        if executor == "simulate":
+            run = [python, str(self.script), "--simulate", host.get("platform", "linux"),
+                   "--profile-report", str(report)] + extra
+            if host.get("simulation_profile"):
+                run += ["--simulation-profile", host["simulation_profile"]]
+            return [run], [], report
+        if executor == "local":
+            return [[python, str(self.script), "--timing-report", str(report)] + extra], [], report
+        if executor != "ssh":
+            raise ValueError(f"Unknown executor for {host['name']}: {executor}")
+        address = host["address"]
+        ssh = ["ssh", "-o", "BatchMode=yes", address]
+        remote_report = f"{self.REMOTE_DIR}/timings.json"
+        remote_args = " ".join(shlex.quote(arg) for arg in extra)
+        return [
+            ssh + [f"mkdir -p {self.REMOTE_DIR} && rm -f {remote_report}"],
+            ["scp", "-q", "-o", "BatchMode=yes", "-r", str(self.script),
+             str(self.script.parent / "config"), f"{address}:{self.REMOTE_DIR}/"],
+            ssh + [f"{python} {self.REMOTE_DIR}/{self.script.name} "
+                   f"--timing-report {remote_report} {remote_args}"],
+        ], [
+            ["scp", "-q", "-o", "BatchMode=yes", f"{address}:{remote_report}", str(report)],
+        ], report
+    
+    def run_host(self, host):
+        """Run every command for one host, streaming output; returns its result"""
+        hostdir = self.workdir / host["name"]
+        hostdir.mkdir(parents=True, exist_ok=True)
+        env = dict(os.environ)
+        if host.get("executor") == "simulate":
+            # Keep each stand-in target's state and caches apart.
+            env["XDG_CACHE_HOME"] = str(hostdir / "cache")
+        tail = collections.deque(maxlen=20)
+        started = time.time()
+        returncode = 0
+        report = None
+        self.say(host, "started")
+        try:
+            commands, fetch, report = self.commands(host, hostdir)
+            # A report left by an earlier run must not pass for this one.
+            report.unlink(missing_ok=True)
+            for command in commands:
+                returncode = self.stream(host, command, env, tail)
+                if returncode:
+                    break
+            # Timings of the steps that did finish are wanted after a failure too.
+            for command in fetch:
+                fetched = self.stream(host, command, env, tail)
+                returncode = returncode or fetched
+        except (OSError, ValueError, KeyError) as e:
+            returncode = -1
+            tail.append(str(e))
+        seconds = time.time() - started
+        status = "ok" if returncode == 0 else "failed"
+        self.say(host, f"{status} in {seconds:.1f}s")
+        return {"host": host["name"], "status": status, "returncode": returncode,
+                "seconds": round(seconds, 3), "steps": self.read_steps(report),
+                "output_tail": list(tail) if returncode else []}
+    
+    def stream(self, host, command, env, tail):
+        """Run one command, echoing its output under the host's name; returns its exit code"""
+        process = subprocess.Popen(command, stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT, text=True,
+                                   errors="replace", env=env)
+        for line in process.stdout:
+            tail.append(line.rstrip())
+            self.say(host, line.rstrip())
+        return process.wait()
+    
+    @staticmethod
+    def read_steps(report):
+        """Step durations from a timing report or a --simulate profile report"""
+        try:
+            with open(report, "r") as f:
+                data = json.load(f)
+        except (TypeError, OSError, ValueError):
+            return {}
+        if isinstance(data, list):
+            steps = {}
+            for result in data:
+                steps.update(result["steps"])
+            return steps
+        return {step["step"]: step["seconds"] for step in data.get("steps", [])}
+    
+    def run(self):
+        """Provision every host and return the aggregate report"""
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=self.max_parallel) as pool:
+            results = list(pool.map(self.run_host, self.hosts))
+        durations = collections.defaultdict(list)
+        for result in results:
+            for step, seconds in result["steps"].items():
+                durations[step].append(seconds)
+        slowest = sorted(({"step": step, "hosts": len(times),
+                           "mean_seconds": round(sum(times) / len(times), 3),
+                           "max_seconds": round(max(times), 3)}
+                          for step, times in durations.items()),
+                         key=lambda item: item["max_seconds"], reverse=True)
+        return {
+            "hosts": len(results),
+            "succeeded": sum(result["status"] == "ok" for result in results),
+            "failed": [result["host"] for result in results if result["status"] != "ok"],
+            "wall_seconds": round(time.time() - started, 3),
+            "slowest_steps": slowest,
+            "results": results,
+        }
+
+def print_fleet_report(report):
+    print("=" * 50)
+    print(f"Fleet: {report['succeeded']}/{report['hosts']} hosts succeeded "
+          f"in {report['wall_seconds']:.1f}s")
+    for result in sorted(report["results"], key=lambda item: item["seconds"], reverse=True):
+        print(f"   {result['seconds']:8.1f}s  {result['host']} ({result['status']})")
+    if report["slowest_steps"]:
+        print("Slowest steps (max across hosts):")
+        for step in report["slowest_steps"][:5]:
+            print(f"   {step['max_seconds']:8.1f}s  {step['step']} "
+                  f"(mean {step['mean_seconds']:.1f}s on {step['hosts']} hosts)")
+    for result in report["results"]:
+        if result["status"] != "ok":
+            print(f"❌ {result['host']} failed (exit {result['returncode']}):")
+            for line in result["output_tail"][-5:]:
+                print(f"   {line}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Development environment setup")
+    parser.add_argument("--jobs", type=int, default=4,
+                        help="maximum number of setup steps to run concurrently")
+    parser.add_argument("--force", action="store_true",
+                        help="reinstall and reconfigure everything, ignoring detected state")
+    parser.add_argument("--state-ttl", type=int, default=3600,
+                        help="seconds a cached installed-state snapshot stays valid")
+    parser.add_argument("--refresh-state", action="store_true",
+                        help="probe installed tools again instead of using the cache")
+    parser.add_argument("--mirror", metavar="DIR_OR_URL",
+                        help="artifact mirror laid out as <host>/<path>, tried before the origin")
+    parser.add_argument("--artifact-cache-mb", type=int, default=2048,
+                        help="size limit of the local download cache")
+    parser.add_argument("--export-mirror", metavar="DIR",
+                        help="copy cached downloads into a mirror directory and exit")
+    parser.add_argument("--step-timeout", type=int, default=1800,
+                        help="seconds a single setup step may run before it is killed (0 disables)")
+    parser.add_argument("--timing-report", metavar="PATH",
+                        help="where to write the JSON timing report")
+    parser.add_argument("--plan", action="store_true",
+                        help="print the compiled provisioning plan and exit; "
+                             "with --simulate, the plan of the simulated platform")
+    parser.add_argument("--simulate", choices=["linux", "darwin", "windows", "all"],
+                        help="replay a platform's setup against a fake command runner "
+                             "and print a provisioning profile; nothing is installed")
+    parser.add_argument("--simulation-profile", metavar="PATH",
+                        help="JSON latency model for --simulate")
+    parser.add_argument("--time-scale", type=float, default=0.001,
+                        help="real seconds slept per simulated second")
+    parser.add_argument("--profile-report", metavar="PATH",
+                        help="write the --simulate results as JSON")
+    parser.add_argument("--fleet", metavar="INVENTORY",
+                        help="provision every host in a JSON inventory instead of this machine")
+    parser.add_argument("--fleet-parallel", type=int, default=8,
+                        help="hosts provisioned at the same time")
+    parser.add_argument("--fleet-dir", metavar="DIR",
+                        help="where per-host reports are collected")
+    parser.add_argument("--fleet-report", metavar="PATH",
+                        help="write the aggregate fleet report as JSON")
+    args = parser.parse_args(argv)
+    if args.mirror and urlparse(args.mirror).scheme == "http":
+        parser.error("--mirror must be a directory, file:// or https:// URL, not plain http")
+    return args
 
 if __name__ == "__main__":
-    setup = DevEnvironmentSetup()
+    args = parse_args()
+    if args.fleet:
+        # Options forwarded to the setup run on every host.
+        forwarded = ["--jobs", str(args.jobs), "--step-timeout", str(args.step_timeout)]
+        if args.force:
+            forwarded.append("--force")
+        if args.mirror:
+            forwarded += ["--mirror", args.mirror]
+        driver = FleetDriver.load(args.fleet, workdir=args.fleet_dir,
+                                  max_parallel=args.fleet_parallel, setup_args=forwarded)
+        report = driver.run()
+        print_fleet_report(report)
+        if args.fleet_report:
+            with open(args.fleet_report, "w") as f:
+                json.dump(report, f, indent=2)
+        sys.exit(1 if report["failed"] else 0)
+    if args.simulate:
+        if args.simulation_profile:
+            profile = SimulationProfile.load(args.simulation_profile, args.time_scale)
+        else:
+            profile = SimulationProfile(time_scale=args.time_scale)
+        platforms = ["linux", "darwin", "windows"] if args.simulate == "all" else [args.simulate]
+        config = DevEnvironmentSetup(jobs=args.jobs).config
+        if args.plan:
+            for name in platforms:
+                handler = simulated_handler(name, profile, config, args.jobs, args.force)
+                handler.probe_state()
+                print_plan(handler.load_plan())
+            sys.exit(0)
+        results = [profile_run(name, profile, config, args.jobs, args.force)
+                   for name in platforms]
+        for result in results:
+            print_profile(result)
+        if args.profile_report:
+            with open(args.profile_report, "w") as f:
+                json.dump(results, f, indent=2)
+        sys.exit(1 if any(result["error"] for result in results) else 0)
+    setup = DevEnvironmentSetup(jobs=args.jobs, force=args.force,
+                                state_ttl=args.state_ttl,
+                                refresh_state=args.refresh_state,
+                                mirror=args.mirror,
+                                artifact_cache_mb=args.artifact_cache_mb,
+                                step_timeout=args.step_timeout,
+                                timing_report=args.timing_report)
+    if args.export_mirror:
+        count = setup.artifacts.export_mirror(args.export_mirror)
+        print(f"Exported {count} artifacts to {args.export_mirror}")
+        sys.exit(0)
+    if args.plan:
+        setup.show_plan()
+        sys.exit(0)
     setup.run()
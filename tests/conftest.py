@@ -0,0 +1,45 @@
+import http.client
+import os
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def docs_server(tmp_path, monkeypatch):
+    """Start a DocumentationHandler server over tmp_path; returns its handler class and port.
+
+    Keyword arguments override handler class attributes. Each test gets its own
+    caches, metrics and a discarded access log.
+    """
+    servers = []
+    monkeypatch.chdir(tmp_path)
+
+    def start(**attrs):
+        attrs.setdefault('content_cache', server.ContentCache())
+        attrs.setdefault('metrics', server.RequestMetrics())
+        attrs.setdefault('access_log', server.AccessLog(path=os.devnull))
+        handler = type('Handler', (server.DocumentationHandler,), attrs)
+        httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        servers.append(httpd)
+        return handler, httpd.server_address[1]
+
+    yield start
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def get(port, path, headers=None):
+    """One GET on a fresh connection; returns (response, body)"""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    try:
+        connection.request('GET', path, headers=headers or {})
+        response = connection.getresponse()
+        return response, response.read()
+    finally:
+        connection.close()
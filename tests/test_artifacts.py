@@ -0,0 +1,133 @@
+"""ArtifactCache downloads, mirror lookup and eviction in setup.py."""
+
+import hashlib
+import json
+from urllib.parse import urlparse
+
+import pytest
+
+import setup
+from setup import ArtifactCache
+
+ORIGIN = 'https://example.invalid/install.sh'
+
+
+def digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+@pytest.fixture
+def origin(tmp_path):
+    """Write a file served through a file:// URL; returns its URL"""
+    root = tmp_path / 'origin'
+    root.mkdir()
+
+    def serve(name, data):
+        path = root / name
+        path.write_bytes(data)
+        return path.as_uri()
+    return serve
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    """Record every URL the cache opens"""
+    urls = []
+    urlopen = setup.urlopen
+
+    def recording(url, *args, **kwargs):
+        urls.append(url)
+        return urlopen(url, *args, **kwargs)
+    monkeypatch.setattr(setup, 'urlopen', recording)
+    return urls
+
+
+def mirror_of(tmp_path, files):
+    """Build a mirror from {url: data} the way --export-mirror does"""
+    source = ArtifactCache(tmp_path / 'source')
+    for url, data in files.items():
+        path = tmp_path / 'upstream' / digest(data)
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(data)
+        source.download(url, path.as_uri(), None)
+    mirror = tmp_path / 'mirror'
+    assert source.export_mirror(mirror) == len(files)
+    return mirror
+
+
+def test_cache_hit_needs_no_network(tmp_path, origin, opened):
+    url = origin('key.asc', b'key')
+    cache = ArtifactCache(tmp_path / 'cache')
+    first = cache.fetch(url)
+    assert first.read_bytes() == b'key'
+    opened.clear()
+    assert ArtifactCache(tmp_path / 'cache').fetch(url) == first
+    assert opened == []
+
+
+def test_mirror_is_tried_before_origin(tmp_path, opened):
+    mirror = mirror_of(tmp_path, {ORIGIN: b'echo mirrored'})
+    manifest = json.loads((mirror / 'manifest.json').read_text())
+    assert manifest == {ORIGIN: digest(b'echo mirrored')}
+    cache = ArtifactCache(tmp_path / 'cache', mirror=str(mirror))
+    assert cache.fetch(ORIGIN).read_bytes() == b'echo mirrored'
+    assert opened[-1] == mirror.as_uri() + '/example.invalid/install.sh'
+    assert ORIGIN not in opened
+
+
+def test_mirror_files_outside_manifest_are_ignored(tmp_path, origin, opened):
+    url = origin('tool.tar.gz', b'origin')
+    mirror = mirror_of(tmp_path, {})
+    parsed = urlparse(url)
+    stray = mirror / parsed.netloc / parsed.path.lstrip('/')
+    stray.parent.mkdir(parents=True)
+    stray.write_bytes(b'unlisted')
+    cache = ArtifactCache(tmp_path / 'cache', mirror=str(mirror))
+    assert cache.fetch(url).read_bytes() == b'origin'
+    assert opened[-1] == url
+
+
+def test_tampered_mirror_file_falls_back_to_origin(tmp_path, origin):
+    url = origin('setup.sh', b'good')
+    mirror = mirror_of(tmp_path, {url: b'good'})
+    for path in mirror.rglob('setup.sh'):
+        path.write_bytes(b'evil')
+    cache = ArtifactCache(tmp_path / 'cache', mirror=str(mirror))
+    assert cache.fetch(url).read_bytes() == b'good'
+
+
+def test_checksum_mismatch_raises_and_leaves_no_partial_file(tmp_path, origin):
+    url = origin('key.asc', b'key')
+    cache = ArtifactCache(tmp_path / 'cache')
+    with pytest.raises(OSError, match='checksum mismatch'):
+        cache.fetch(url, sha256=digest(b'other'))
+    assert list(cache.objects.iterdir()) == []
+    assert url not in cache.index
+
+
+@pytest.mark.parametrize('mirror', ['http://mirror.example/artifacts', 'ftp://mirror.example'])
+def test_plain_http_mirrors_are_rejected(tmp_path, mirror):
+    with pytest.raises(ValueError):
+        ArtifactCache(tmp_path / 'cache', mirror=mirror)
+
+
+def test_lru_eviction_keeps_shared_digests(tmp_path, origin, monkeypatch):
+    clock = iter(range(1000))
+    monkeypatch.setattr(setup.time, 'time', lambda: next(clock))
+    cache = ArtifactCache(tmp_path / 'cache', max_bytes=25)
+    first = origin('first', b'a' * 10)
+    copy = origin('copy', b'a' * 10)
+    second = origin('second', b'b' * 10)
+    third = origin('third', b'c' * 10)
+    cache.fetch(first)
+    cache.fetch(copy)
+    cache.fetch(second)
+    assert set(cache.index) == {first, copy, second}
+    assert len(list(cache.objects.iterdir())) == 2
+    cache.fetch(copy)
+    cache.fetch(third)
+    # 'first' was least recently used, but its object is still needed by 'copy'
+    assert set(cache.index) == {copy, third}
+    assert sorted(path.name for path in cache.objects.iterdir()) == sorted(
+        [digest(b'a' * 10), digest(b'c' * 10)])
+    assert cache.lookup(copy, None).read_bytes() == b'a' * 10
@@ -0,0 +1,92 @@
+"""update_git_config in setup.py, checked against `git config --list`."""
+
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from setup import update_git_config
+
+pytestmark = pytest.mark.skipif(shutil.which('git') is None, reason='git is not installed')
+
+
+def git_list(path):
+    result = subprocess.run(['git', 'config', '--file', str(path), '--list'],
+                            capture_output=True, text=True, check=True)
+    return result.stdout.splitlines()
+
+
+def test_replaces_key_in_place(tmp_path):
+    config = tmp_path / 'config'
+    config.write_text('[user]\n\tname = Old\n\temail = a@example.com\n[core]\n\tautocrlf = false\n')
+    update_git_config(config, {'user.name': 'New Name'})
+    assert git_list(config) == ['user.name=New Name', 'user.email=a@example.com',
+                                'core.autocrlf=false']
+
+
+def test_section_headers_are_case_insensitive(tmp_path):
+    config = tmp_path / 'config'
+    config.write_text('[User]\n\tName = Old\n\tname = Duplicate\n')
+    update_git_config(config, {'user.name': 'New', 'user.email': 'b@example.com'})
+    assert git_list(config) == ['user.name=New', 'user.email=b@example.com']
+    assert config.read_text().count('[') == 1
+
+
+def test_subsections(tmp_path):
+    config = tmp_path / 'config'
+    config.write_text('[url "https://github.com/"]\n\tinsteadOf = gh:\n'
+                      '[remote "Origin"]\n\turl = old\n')
+    update_git_config(config, {'url.https://github.com/.insteadOf': 'github:',
+                               'remote.Origin.url': 'new',
+                               'remote.origin.url': 'lower'})
+    assert git_list(config) == ['url.https://github.com/.insteadof=github:',
+                                'remote.Origin.url=new', 'remote.origin.url=lower']
+
+
+def test_appends_new_section(tmp_path):
+    config = tmp_path / 'config'
+    config.write_text('[core]\n\teditor = vim\n')
+    update_git_config(config, {'init.defaultBranch': 'main', 'core.pager': 'less'})
+    assert git_list(config) == ['core.editor=vim', 'core.pager=less', 'init.defaultbranch=main']
+
+
+def test_creates_missing_file(tmp_path):
+    config = tmp_path / 'sub' / 'config'
+    update_git_config(config, {'user.name': 'A'})
+    assert git_list(config) == ['user.name=A']
+
+
+def test_preserves_continuation_lines(tmp_path):
+    config = tmp_path / 'config'
+    config.write_text('[alias]\n\tlg = log \\\n\t--graph\n\tst = status \\\n'
+                      'name = not a key\n[user]\n\tname = Old\n')
+    update_git_config(config, {'alias.st': 's', 'user.name': 'New'})
+    assert git_list(config) == ['alias.lg=log  --graph', 'alias.st=s', 'user.name=New']
+    assert '\tlg = log \\\n\t--graph\n' in config.read_text()
+    assert 'not a key' not in config.read_text()
+
+
+def test_escapes_special_characters(tmp_path):
+    config = tmp_path / 'config'
+    value = 'tab\there "quoted" back\\slash\nnext'
+    update_git_config(config, {'user.name': value})
+    result = subprocess.run(['git', 'config', '--file', str(config), 'user.name'],
+                            capture_output=True, text=True, check=True)
+    assert result.stdout[:-1] == value
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='POSIX symlinks and modes')
+def test_follows_symlink_and_keeps_mode(tmp_path):
+    target = tmp_path / 'dotfiles' / 'gitconfig'
+    target.parent.mkdir()
+    target.write_text('[user]\n\tname = Old\n')
+    target.chmod(0o600)
+    link = tmp_path / '.gitconfig'
+    link.symlink_to(target)
+    update_git_config(link, {'user.name': 'New'})
+    assert link.is_symlink()
+    assert git_list(link) == ['user.name=New']
+    assert os.stat(target).st_mode & 0o777 == 0o600
+    assert not (tmp_path / '.gitconfig.lock').exists()
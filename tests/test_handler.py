@@ -0,0 +1,127 @@
+"""Request dispatch and accounting in DocumentationHandler."""
+
+import http.client
+import os
+import socket
+
+import server
+from conftest import get
+
+
+def raw_request(port, data):
+    with socket.create_connection(('127.0.0.1', port), timeout=5) as sock:
+        sock.sendall(data)
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                return b''.join(chunks)
+            chunks.append(chunk)
+
+
+def test_http09_gets_body_without_headers(tmp_path, docs_server):
+    (tmp_path / 'docs').mkdir()
+    (tmp_path / 'docs' / 'a.md').write_text('# A\n')
+    handler, port = docs_server()
+    assert raw_request(port, b'GET /docs/a.md\r\n\r\n') == b'# A\n'
+    assert raw_request(port, b'GET /\r\n\r\n').startswith(b'<!DOCTYPE html>')
+    assert handler.metrics.requests == {('docs', 200): 1, ('index', 200): 1}
+
+
+def test_failing_handler_is_counted_as_500(docs_server):
+    def serve_broken(self, path, query):
+        self.send_response(200)
+        raise RuntimeError('broken')
+
+    handler, port = docs_server(
+        routes=dict(server.DocumentationHandler.routes, **{'/broken': ('serve_broken', 'api')}),
+        serve_broken=serve_broken)
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    connection.request('GET', '/broken')
+    try:
+        connection.getresponse().read()
+    except (http.client.HTTPException, OSError):
+        pass
+    connection.close()
+    response, _ = get(port, '/api/cache')
+    assert response.status == 200
+    assert handler.metrics.requests[('api', 500)] == 1
+
+
+def test_document_paths_stay_inside_their_directory(tmp_path, docs_server):
+    (tmp_path / 'docs' / 'sub').mkdir(parents=True)
+    (tmp_path / 'docs' / 'a.md').write_text('# A\n')
+    (tmp_path / 'secret.txt').write_text('secret')
+    _, port = docs_server()
+    for path in ('/docs/../secret.txt', '/docs/%2e%2e/secret.txt', '/docs/sub/../../secret.txt',
+                 '/template-setup/../secret.txt'):
+        response, body = get(port, path)
+        assert response.status == 404, path
+        assert b'secret' not in body
+    response, body = get(port, '/docs/sub/../a.md')
+    assert response.status == 200
+    assert body == b'# A\n'
+
+
+def test_head_matches_get_without_body(tmp_path, docs_server):
+    (tmp_path / 'docs').mkdir()
+    (tmp_path / 'docs' / 'x.md').write_text('# X\n')
+    (tmp_path / 'docs' / 'big.bin').write_bytes(b'b' * 4096)
+    handler, port = docs_server(content_cache=server.ContentCache(stream_threshold=1024))
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    for path in ('/', '/api/structure', '/metrics', '/docs/x.md', '/docs/big.bin',
+                 '/docs/x.md?format=html', '/docs/missing.md'):
+        connection.request('GET', path)
+        expected = connection.getresponse()
+        expected.read()
+        connection.request('HEAD', path)
+        response = connection.getresponse()
+        assert response.read() == b''
+        assert response.status == expected.status, path
+        # /metrics grows between the two requests, so only its type can match.
+        headers = ('Content-Type',) if path == '/metrics' else ('Content-Type', 'Content-Length', 'ETag')
+        for header in headers:
+            assert response.getheader(header) == expected.getheader(header), (path, header)
+    connection.request('HEAD', '/docs/big.bin', headers={'Range': 'bytes=0-9, 100-109'})
+    response = connection.getresponse()
+    assert response.status == 206
+    assert response.read() == b''
+    connection.close()
+    assert handler.metrics.requests[('docs', 200)] == 6
+
+
+def test_directories_and_unreadable_files_are_404(tmp_path, docs_server):
+    (tmp_path / 'docs' / 'Guide').mkdir(parents=True)
+    (tmp_path / 'docs' / 'a.md').write_text('# A\n')
+    locked = tmp_path / 'docs' / 'locked.md'
+    locked.write_text('# Locked\n')
+    locked.chmod(0)
+    handler, port = docs_server()
+    paths = ['/docs/Guide', '/docs/Guide/', '/docs/Guide?format=html', '/docs/a.md/x']
+    if not os.access(locked, os.R_OK):  # root can read it anyway
+        paths += ['/docs/locked.md', '/docs/locked.md?format=html']
+    for path in paths:
+        response, _ = get(port, path)
+        assert response.status == 404, path
+    assert set(handler.metrics.requests) == {('docs', 404)}
+
+
+def test_prerender_does_not_count_as_misses(tmp_path, docs_server):
+    (tmp_path / 'docs').mkdir()
+    (tmp_path / 'docs' / 'a.md').write_text('# A\n')
+    content_cache = server.ContentCache()
+    render_cache = server.RenderCache(content_cache)
+    render_cache.prerender(['docs/a.md'])
+    assert render_cache.stats()['entries'] == 1
+    assert (render_cache.stats()['misses'], content_cache.stats()['misses']) == (0, 0)
+    _, port = docs_server(content_cache=content_cache, render_cache=render_cache)
+    response, _ = get(port, '/docs/a.md?format=html')
+    assert response.status == 200
+    assert render_cache.stats()['hit_ratio'] == 1.0
+
+
+def test_prefork_workers_refuse_metrics(docs_server):
+    handler, port = docs_server(per_process_metrics=True)
+    response, body = get(port, '/metrics')
+    assert response.status == 501
+    assert b'prefork' in body
@@ -0,0 +1,113 @@
+"""Range request parsing and 206 / multipart / 416 responses in server.py."""
+
+import http.client
+
+import pytest
+
+import server
+from server import MAX_RANGES, parse_byte_ranges
+
+BODY = bytes(range(256)) * 40  # 10240 bytes
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('bytes=0-99', [(0, 99)]),
+    ('bytes=-100', [(10140, 10239)]),
+    ('bytes=-20000', [(0, 10239)]),
+    ('bytes=10000-', [(10000, 10239)]),
+    ('bytes=10000-99999', [(10000, 10239)]),
+    ('bytes=0-0, -1', [(0, 0), (10239, 10239)]),
+])
+def test_parse_ranges(header, expected):
+    assert parse_byte_ranges(header, len(BODY)) == expected
+
+
+@pytest.mark.parametrize('header', ['bytes=10240-', 'bytes=20000-30000', 'bytes=-0'])
+def test_unsatisfiable_ranges(header):
+    assert parse_byte_ranges(header, len(BODY)) == []
+
+
+@pytest.mark.parametrize('header', ['bytes=100-50', 'items=0-10', 'bytes=', 'bytes=abc',
+                                    'bytes=5', 'bytes=--5'])
+def test_ignored_ranges(header):
+    assert parse_byte_ranges(header, len(BODY)) is None
+
+
+def test_overlapping_and_adjacent_ranges_coalesce():
+    header = 'bytes=500-600, 0-99, 50-149, 150-199, 550-700'
+    assert parse_byte_ranges(header, len(BODY)) == [(0, 199), (500, 700)]
+
+
+def test_too_many_ranges_are_ignored():
+    many = ', '.join(f'{i * 10}-{i * 10 + 1}' for i in range(MAX_RANGES + 1))
+    assert parse_byte_ranges('bytes=' + many, len(BODY)) is None
+    allowed = ', '.join(f'{i * 10}-{i * 10 + 1}' for i in range(MAX_RANGES))
+    assert len(parse_byte_ranges('bytes=' + allowed, len(BODY))) == MAX_RANGES
+
+
+@pytest.fixture(params=['buffered', 'streamed'])
+def client(request, tmp_path, docs_server):
+    (tmp_path / 'docs').mkdir()
+    (tmp_path / 'docs' / 'data.bin').write_bytes(BODY)
+    threshold = len(BODY) * 2 if request.param == 'buffered' else 1024
+    _, port = docs_server(content_cache=server.ContentCache(stream_threshold=threshold))
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+
+    def get(headers=None):
+        connection.request('GET', '/docs/data.bin', headers=headers or {})
+        response = connection.getresponse()
+        return response, response.read()
+
+    yield get
+    connection.close()
+
+
+def test_single_range(client):
+    response, body = client({'Range': 'bytes=100-199'})
+    assert response.status == 206
+    assert response.getheader('Content-Range') == f'bytes 100-199/{len(BODY)}'
+    assert body == BODY[100:200]
+
+
+def test_suffix_range(client):
+    response, body = client({'Range': 'bytes=-10'})
+    assert response.status == 206
+    assert body == BODY[-10:]
+
+
+def test_multipart_ranges(client):
+    response, body = client({'Range': 'bytes=0-9, 5000-5009'})
+    assert response.status == 206
+    content_type = response.getheader('Content-Type')
+    assert content_type.startswith('multipart/byteranges; boundary=')
+    boundary = content_type.split('boundary=')[1].encode()
+    assert int(response.getheader('Content-Length')) == len(body)
+    parts = body.split(b'--' + boundary)
+    assert parts[-1] == b'--\r\n'
+    assert parts[1].endswith(b'\r\n\r\n' + BODY[0:10] + b'\r\n')
+    assert b'Content-Range: bytes 5000-5009/10240' in parts[2]
+    assert parts[2].endswith(b'\r\n\r\n' + BODY[5000:5010] + b'\r\n')
+
+
+def test_unsatisfiable_range(client):
+    response, body = client({'Range': f'bytes={len(BODY)}-'})
+    assert response.status == 416
+    assert response.getheader('Content-Range') == f'bytes */{len(BODY)}'
+    assert body == b''
+
+
+def test_malformed_range_sends_full_body(client):
+    response, body = client({'Range': 'bytes=9-1'})
+    assert response.status == 200
+    assert body == BODY
+
+
+def test_if_range(client):
+    response, _ = client()
+    etag = response.getheader('ETag')
+    response, body = client({'Range': 'bytes=0-9', 'If-Range': etag})
+    assert response.status == 206
+    assert body == BODY[:10]
+    response, body = client({'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+    assert response.status == 200
+    assert body == BODY
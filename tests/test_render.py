@@ -0,0 +1,33 @@
+"""Built-in markdown renderer in server.py."""
+
+import pytest
+
+from server import render_inline, render_markdown_page
+
+
+def test_links_and_images():
+    assert (render_inline('[Guide](docs/a.md?x=1&y=2)')
+            == '<a href="docs/a.md?x=1&amp;y=2">Guide</a>')
+    assert (render_inline('![A "logo"](https://example.com/l.png)')
+            == '<img src="https://example.com/l.png" alt="A &quot;logo&quot;">')
+
+
+def test_quotes_cannot_leave_the_attribute():
+    rendered = render_inline('[y](a"onmouseover="alert(1))')
+    assert rendered.startswith('<a href="a&quot;onmouseover=&quot;alert(1">')
+    assert ' onmouseover=' not in rendered
+
+
+@pytest.mark.parametrize('url', ['javascript:alert%281%29', 'JavaScript:void0',
+                                 'data:text/html,x', 'vbscript:x'])
+def test_unsafe_schemes_are_dropped(url):
+    assert render_inline(f'[click]({url})') == 'click'
+    assert render_inline(f'![pic]({url})') == 'pic'
+
+
+def test_pages_escape_raw_html_and_unsafe_links():
+    page = render_markdown_page('# T\n\n<script>alert(1)</script>\n\n[x](javascript:alert%281%29)\n',
+                                'T').decode()
+    assert '<script>alert' not in page
+    assert '&lt;script&gt;' in page
+    assert 'javascript:' not in page
@@ -0,0 +1,141 @@
+"""Replay of every platform's setup against the simulated runner in setup.py."""
+
+import json
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+import setup
+from setup import SimulationProfile, Step
+
+PLATFORMS = ['linux', 'darwin', 'windows']
+SETUP_PY = Path(setup.__file__)
+
+
+@pytest.fixture(scope='module')
+def config():
+    return setup.DevEnvironmentSetup().config
+
+
+def replay(platform_name, profile, config, jobs=4):
+    """Run a simulated setup; returns the handler, its (event, step) sequence and any error"""
+    handler = setup.simulated_handler(platform_name, profile, config, jobs)
+    handler.planned = []
+    handler.pending_tools = []
+    events = []
+    lock = threading.Lock()
+    run_steps = handler.run_steps
+
+    def traced(step):
+        def action():
+            with lock:
+                events.append(('start', step.name))
+            try:
+                step.action()
+            finally:
+                with lock:
+                    events.append(('end', step.name))
+        return action
+
+    handler.run_steps = lambda steps: run_steps(
+        [Step(step.name, traced(step), step.requires, step.locks) for step in steps])
+    try:
+        handler.run()
+    except subprocess.CalledProcessError as e:
+        return handler, events, e
+    return handler, events, None
+
+
+@pytest.mark.parametrize('platform_name', PLATFORMS)
+def test_steps_respect_dependencies_and_locks(platform_name, config):
+    handler, events, error = replay(platform_name, SimulationProfile(time_scale=0), config)
+    assert error is None
+    assert handler.planned
+    position = {event: index for index, event in enumerate(events)}
+    steps = {step.name: step for step in handler.planned}
+    assert {name for _, name in events} == set(steps)
+    for step in handler.planned:
+        for required in step.requires:
+            assert position[('end', required)] < position[('start', step.name)]
+    for first in handler.planned:
+        for second in handler.planned:
+            if first.name < second.name and first.locks & second.locks:
+                assert (position[('end', first.name)] < position[('start', second.name)]
+                        or position[('end', second.name)] < position[('start', first.name)])
+
+
+@pytest.mark.parametrize('platform_name', PLATFORMS)
+def test_profile_run_reports_every_step(platform_name, config):
+    result = setup.profile_run(platform_name, SimulationProfile(time_scale=0), config)
+    assert result['error'] is None
+    assert result['commands'] > 0
+    assert result['critical_path'][-1] in result['steps']
+    assert set(result['critical_path']) <= set(result['steps'])
+
+
+@pytest.mark.parametrize('platform_name', PLATFORMS)
+def test_installed_tools_are_skipped(platform_name, config):
+    profile = SimulationProfile(time_scale=0, installed=config['tools'])
+    result = setup.profile_run(platform_name, profile, config)
+    assert result['error'] is None
+    assert result['steps'] == {}
+    assert result['commands'] == 0
+
+
+def test_failing_command_stops_dependent_steps(config):
+    profile = SimulationProfile(time_scale=0, fail=[r'apt install -y git'])
+    handler, events, error = replay('linux', profile, config)
+    assert error is not None
+    started = {name for event, name in events if event == 'start'}
+    assert 'packages' in started
+    assert not started & {'git-config', 'vscode-extensions', 'playwright'}
+    result = setup.profile_run('linux', profile, config)
+    assert 'apt install -y git' in result['error']
+
+
+def test_simulate_exits_non_zero_on_failure(tmp_path):
+    profile = tmp_path / 'profile.json'
+    profile.write_text(json.dumps({'fail': ['brew install --cask']}))
+    result = subprocess.run(
+        [sys.executable, str(SETUP_PY), '--simulate', 'all', '--time-scale', '0',
+         '--simulation-profile', str(profile)],
+        capture_output=True, text=True, timeout=120)
+    assert result.returncode == 1
+    assert 'failed: ' in result.stdout
+    passing = subprocess.run(
+        [sys.executable, str(SETUP_PY), '--simulate', 'all', '--time-scale', '0'],
+        capture_output=True, text=True, timeout=120)
+    assert passing.returncode == 0
+
+
+def test_fleet_reports_failed_hosts_and_their_timings(tmp_path):
+    profile = tmp_path / 'fail.json'
+    profile.write_text(json.dumps({'fail': ['apt install -y git']}))
+    inventory = tmp_path / 'inventory.json'
+    inventory.write_text(json.dumps([
+        {'name': 'good', 'executor': 'simulate', 'platform': 'darwin',
+         'args': ['--time-scale', '0']},
+        {'name': 'bad', 'executor': 'simulate', 'platform': 'linux',
+         'args': ['--time-scale', '0'], 'simulation_profile': str(profile)},
+    ]))
+    report_path = tmp_path / 'fleet.json'
+    result = subprocess.run(
+        [sys.executable, str(SETUP_PY), '--fleet', str(inventory), '--fleet-dir',
+         str(tmp_path / 'fleet'), '--fleet-report', str(report_path)],
+        capture_output=True, text=True, timeout=120)
+    assert result.returncode == 1
+    report = json.loads(report_path.read_text())
+    assert report['hosts'] == 2
+    assert report['succeeded'] == 1
+    assert report['failed'] == ['bad']
+    results = {result['host']: result for result in report['results']}
+    # Steps the failing host finished before its error are still reported.
+    assert 'packages' in results['bad']['steps']
+    assert results['bad']['output_tail']
+    steps = {item['step']: item for item in report['slowest_steps']}
+    assert steps['packages']['hosts'] == 2
+    maxima = [item['max_seconds'] for item in report['slowest_steps']]
+    assert maxima == sorted(maxima, reverse=True)